@@ -13,6 +13,7 @@ from telegram import (
     KeyboardButton,
     ReplyKeyboardMarkup,
 )
+from telegram.error import BadRequest, Forbidden, NetworkError, TimedOut
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -33,12 +34,32 @@ AWAIT_BROADCAST_TARGET_USER = 36
 AWAIT_USER_SEARCH = 37
 AWAIT_DATA_EXPORT_TYPE = 38
 
+# Broadcast fan-out: in-flight sends. Pacing to Telegram's ~30 msg/s is left to the
+# application's AIORateLimiter, which every bot call already goes through.
+BROADCAST_CONCURRENCY = 25
+BROADCAST_MAX_ATTEMPTS = 3
+
+# Reply keyboards are immutable, build them once at import
+ADMIN_KEYBOARD = ReplyKeyboardMarkup(
+    [
+        [KeyboardButton("👤 User Info"), KeyboardButton("💰 Payment Method")],
+        [KeyboardButton("❓ Help Center"), KeyboardButton("✨ Premium & Star")],
+        [KeyboardButton("👾 Broadcast"), KeyboardButton("⚙️ Bot Status")],
+        [KeyboardButton("📝 Cash Control"), KeyboardButton("👤 User Search")],
+        [KeyboardButton("📈 System Health"), KeyboardButton("📤 Data Export")]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False
+)
+ADMIN_CANCEL_KEYBOARD = ReplyKeyboardMarkup([["🚫 Cancel"]], resize_keyboard=True)
+
 class AdminCommands:
     def __init__(self, ws_user_data, ws_config, ws_orders, ws_admin_logs, 
                  get_config_data, get_dynamic_admin_id, is_multi_admin,
                  log_admin_action, get_all_users, get_pending_orders,
                  update_order_status, update_config_value, set_bot_status,
-                 get_bot_status):
+                 get_bot_status, run_sheets_io=None, update_cached_user=None, ais_multi_admin=None,
+                 adjust_user_balance=None):
         self.ws_user_data = ws_user_data
         self.ws_config = ws_config
         self.ws_orders = ws_orders
@@ -53,13 +74,22 @@ class AdminCommands:
         self.update_config_value = update_config_value
         self.set_bot_status = set_bot_status
         self.get_bot_status = get_bot_status
+        # Runs blocking gspread calls off the event loop; defaults to a plain worker thread
+        self.run_sheets_io = run_sheets_io or asyncio.to_thread
+        # Async admin check; the default runs the sync one in a worker since it may read the config sheet
+        self.ais_multi_admin = ais_multi_admin or (lambda user_id: self.run_sheets_io(self.is_multi_admin, user_id))
+        # Keeps the bot's in-memory user table in step with direct sheet edits made here
+        self.update_cached_user = update_cached_user or (lambda user_id, **fields: None)
+        # Async (user_id, change) -> (old, new) or None; the bot's version holds its per-user
+        # balance lock so Cash Control cannot interleave with receipt approvals and purchases
+        self.adjust_user_balance = adjust_user_balance or self._adjust_user_balance
     
     def register_handlers(self, application):
         """Register all admin command handlers"""
         
         # Broadcast Conversation Handler
         broadcast_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Text("👾 Broadcast"), self.start_broadcast_type)],
+            entry_points=[MessageHandler(filters.Text(["👾 Broadcast"]), self.start_broadcast_type)],
             states={
                 AWAIT_BROADCAST_TYPE: [
                     CallbackQueryHandler(self.handle_broadcast_type, pattern=r"^broadcast_type_")
@@ -76,7 +106,7 @@ class AdminCommands:
                 ]
             },
             fallbacks=[
-                MessageHandler(filters.Text("🚫 Cancel"), self.cancel_broadcast_action),
+                MessageHandler(filters.Text(["🚫 Cancel"]), self.cancel_broadcast_action),
                 CallbackQueryHandler(self.cancel_broadcast_action_callback, pattern=r"^broadcast_cancel$")
             ],
             allow_reentry=True
@@ -84,12 +114,12 @@ class AdminCommands:
         application.add_handler(broadcast_handler)
         
         # Bot Status Handler
-        application.add_handler(MessageHandler(filters.Text("⚙️ Bot Status"), self.handle_bot_status))
+        application.add_handler(MessageHandler(filters.Text(["⚙️ Bot Status"]), self.handle_bot_status))
         application.add_handler(CallbackQueryHandler(self.bot_status_callback, pattern=r"^bot_"))
         
         # Cash Control Conversation Handler
         cash_control_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Text("📝 Cash Control"), self.start_cash_control)],
+            entry_points=[MessageHandler(filters.Text(["📝 Cash Control"]), self.start_cash_control)],
             states={
                 AWAIT_CASH_CONTROL_ID: [
                     MessageHandler(filters.TEXT & ~filters.COMMAND, self.cash_control_get_id)
@@ -99,37 +129,37 @@ class AdminCommands:
                     CallbackQueryHandler(self.handle_user_add_coins, pattern=r"^user_add_")
                 ]
             },
-            fallbacks=[MessageHandler(filters.Text("🚫 Cancel"), self.cash_control_cancel)],
+            fallbacks=[MessageHandler(filters.Text(["🚫 Cancel"]), self.cash_control_cancel)],
             allow_reentry=True
         )
         application.add_handler(cash_control_handler)
         
         # User Search Handler
         user_search_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Text("👤 User Search"), self.start_user_search)],
+            entry_points=[MessageHandler(filters.Text(["👤 User Search"]), self.start_user_search)],
             states={
                 AWAIT_USER_SEARCH: [
                     MessageHandler(filters.TEXT & ~filters.COMMAND, self.process_user_search)
                 ]
             },
-            fallbacks=[MessageHandler(filters.Text("🚫 Cancel"), self.cancel_user_search)],
+            fallbacks=[MessageHandler(filters.Text(["🚫 Cancel"]), self.cancel_user_search)],
             allow_reentry=True
         )
         application.add_handler(user_search_handler)
         
         # System Health Handler
-        application.add_handler(MessageHandler(filters.Text("📈 System Health"), self.handle_system_health))
+        application.add_handler(MessageHandler(filters.Text(["📈 System Health"]), self.handle_system_health))
         application.add_handler(CallbackQueryHandler(self.health_refresh_callback, pattern=r"^health_"))
         
         # Data Export Handler
         data_export_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Text("📤 Data Export"), self.start_data_export)],
+            entry_points=[MessageHandler(filters.Text(["📤 Data Export"]), self.start_data_export)],
             states={
                 AWAIT_DATA_EXPORT_TYPE: [
                     CallbackQueryHandler(self.process_data_export, pattern=r"^export_")
                 ]
             },
-            fallbacks=[MessageHandler(filters.Text("🚫 Cancel"), self.cancel_data_export)],
+            fallbacks=[MessageHandler(filters.Text(["🚫 Cancel"]), self.cancel_data_export)],
             allow_reentry=True
         )
         application.add_handler(data_export_handler)
@@ -169,7 +199,7 @@ class AdminCommands:
     # =============== ENHANCED BROADCAST FEATURE ===============
     async def start_broadcast_type(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         user = update.effective_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await update.message.reply_text("You are not authorized to use Broadcast.")
             return ConversationHandler.END
         
@@ -227,9 +257,9 @@ class AdminCommands:
         if target_input.isdigit():
             user_id = int(target_input)
             try:
-                cell = self.ws_user_data.find(str(user_id), in_column=1)
+                cell = await self.run_sheets_io(self.ws_user_data.find, str(user_id), in_column=1)
                 if cell:
-                    username_cell = self.ws_user_data.cell(cell.row, 2).value
+                    username_cell = (await self.run_sheets_io(self.ws_user_data.cell, cell.row, 2)).value
                     username = username_cell if username_cell else f"ID:{user_id}"
                 else:
                     await update.message.reply_text("❌ User not found.")
@@ -240,9 +270,9 @@ class AdminCommands:
         elif target_input.startswith('@'):
             username = target_input
             try:
-                cell = self.ws_user_data.find(username, in_column=2)
+                cell = await self.run_sheets_io(self.ws_user_data.find, username, in_column=2)
                 if cell:
-                    user_id = int(self.ws_user_data.cell(cell.row, 1).value)
+                    user_id = int((await self.run_sheets_io(self.ws_user_data.cell, cell.row, 1)).value)
                 else:
                     await update.message.reply_text("❌ User not found.")
                     return AWAIT_BROADCAST_TARGET_USER
@@ -297,7 +327,9 @@ class AdminCommands:
             return AWAIT_BROADCAST_MESSAGE
         
         if broadcast_type == 'all':
-            users = self.get_all_users()
+            users = await self.run_sheets_io(self._get_broadcast_recipients)
+            # Reused by confirm_broadcast so the sheet is only downloaded once
+            context.user_data['broadcast_rows'] = users
             user_count = len(users)
             preview_info = f"**Recipients:** {user_count} users"
         else:
@@ -331,60 +363,69 @@ class AdminCommands:
         message_type = context.user_data.get('broadcast_message_type', 'text')
         
         if broadcast_type == 'all':
-            users = self.get_all_users()
+            users = context.user_data.pop('broadcast_rows', None)
+            if users is None:
+                users = await self.run_sheets_io(self._get_broadcast_recipients)
             total_users = len(users)
-            successful = 0
-            failed = 0
+            if not total_users:
+                await query.message.reply_text("❌ No users to broadcast to. Please try again later.")
+                self._clear_broadcast_context(context)
+                return ConversationHandler.END
+            counts = {"successful": 0, "failed": 0}
             
             status_msg = await query.message.reply_text(f"📤 Broadcasting to {total_users} users...\n✅ Successful: 0\n❌ Failed: 0")
             
-            for user_data in users:
-                try:
-                    user_id = int(user_data['user_id'])
-                    
-                    if message_type == 'text':
-                        await context.bot.send_message(
-                            chat_id=user_id,
-                            text=f"📢 **ANNOUNCEMENT**\n\n{context.user_data.get('broadcast_content', '')}\n\n— Admin Team",
-                            parse_mode="Markdown"
-                        )
-                    elif message_type == 'photo':
-                        await context.bot.send_photo(
-                            chat_id=user_id,
-                            photo=context.user_data.get('broadcast_photo'),
-                            caption=f"📢 **ANNOUNCEMENT**\n\n{context.user_data.get('broadcast_caption', '')}\n\n— Admin Team",
-                            parse_mode="Markdown"
-                        )
-                    elif message_type == 'video':
-                        await context.bot.send_video(
-                            chat_id=user_id,
-                            video=context.user_data.get('broadcast_video'),
-                            caption=f"📢 **ANNOUNCEMENT**\n\n{context.user_data.get('broadcast_caption', '')}\n\n— Admin Team",
-                            parse_mode="Markdown"
-                        )
-                    elif message_type == 'document':
-                        await context.bot.send_document(
-                            chat_id=user_id,
-                            document=context.user_data.get('broadcast_document'),
-                            caption=f"📢 **ANNOUNCEMENT**\n\n{context.user_data.get('broadcast_caption', '')}\n\n— Admin Team",
-                            parse_mode="Markdown"
-                        )
-                    
-                    successful += 1
-                    
-                    if successful % 10 == 0:
+            # A fixed pool of workers drains the queue, so large user lists don't spawn one task per user
+            queue: asyncio.Queue = asyncio.Queue()
+            for u in users:
+                queue.put_nowait(u)
+            
+            async def _send_one(user_data):
+                for attempt in range(1, BROADCAST_MAX_ATTEMPTS + 1):
+                    try:
+                        await self._send_broadcast_content(context, int(user_data['user_id']), "📢 **ANNOUNCEMENT**")
+                        counts["successful"] += 1
+                    except Forbidden:
+                        # User blocked the bot
+                        counts["failed"] += 1
+                    except BadRequest as e:
+                        counts["failed"] += 1
+                        logger.error(f"Failed to send broadcast to {user_data['user_id']}: {e}")
+                    except TimedOut as e:
+                        # The announcement may already have been delivered, so do not resend it
+                        counts["failed"] += 1
+                        logger.error(f"Failed to send broadcast to {user_data['user_id']}: {e}")
+                    except NetworkError as e:
+                        # Transient connection error: back off 0.5s, 1s, ... and retry this user
+                        if attempt < BROADCAST_MAX_ATTEMPTS:
+                            await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+                            continue
+                        counts["failed"] += 1
+                        logger.error(f"Failed to send broadcast to {user_data['user_id']}: {e}")
+                    except Exception as e:
+                        counts["failed"] += 1
+                        logger.error(f"Failed to send broadcast to {user_data['user_id']}: {e}")
+                    break
+                
+                done = counts["successful"] + counts["failed"]
+                if done % 10 == 0:
+                    try:
                         await status_msg.edit_text(
                             f"📤 Broadcasting to {total_users} users...\n"
-                            f"✅ Successful: {successful}\n"
-                            f"❌ Failed: {failed}\n"
-                            f"📊 Progress: {((successful + failed) / total_users * 100):.1f}%"
+                            f"✅ Successful: {counts['successful']}\n"
+                            f"❌ Failed: {counts['failed']}\n"
+                            f"📊 Progress: {(done / total_users * 100):.1f}%"
                         )
-                        
-                    await asyncio.sleep(0.1)
-                    
-                except Exception as e:
-                    failed += 1
-                    logger.error(f"Failed to send broadcast to {user_data['user_id']}: {e}")
+                    except Exception:
+                        pass
+            
+            async def _worker():
+                while not queue.empty():
+                    await _send_one(queue.get_nowait())
+            
+            await asyncio.gather(*[_worker() for _ in range(min(BROADCAST_CONCURRENCY, total_users))])
+            successful = counts["successful"]
+            failed = counts["failed"]
             
             await status_msg.edit_text(
                 f"✅ **Broadcast Completed!**\n\n"
@@ -395,7 +436,8 @@ class AdminCommands:
                 f"• 📈 Success Rate: {(successful/total_users*100):.1f}%"
             )
             
-            self.log_admin_action(
+            await self.run_sheets_io(
+                self.log_admin_action,
                 admin_id=user.id,
                 admin_username=user.username or str(user.id),
                 action="BROADCAST_ALL",
@@ -407,35 +449,10 @@ class AdminCommands:
             target_username = context.user_data.get('broadcast_target_username', 'Unknown')
             
             try:
-                if message_type == 'text':
-                    await context.bot.send_message(
-                        chat_id=target_user_id,
-                        text=f"📢 **MESSAGE FROM ADMIN**\n\n{context.user_data.get('broadcast_content', '')}\n\n— Admin Team",
-                        parse_mode="Markdown"
-                    )
-                elif message_type == 'photo':
-                    await context.bot.send_photo(
-                        chat_id=target_user_id,
-                        photo=context.user_data.get('broadcast_photo'),
-                        caption=f"📢 **MESSAGE FROM ADMIN**\n\n{context.user_data.get('broadcast_caption', '')}\n\n— Admin Team",
-                        parse_mode="Markdown"
-                    )
-                elif message_type == 'video':
-                    await context.bot.send_video(
-                        chat_id=target_user_id,
-                        video=context.user_data.get('broadcast_video'),
-                        caption=f"📢 **MESSAGE FROM ADMIN**\n\n{context.user_data.get('broadcast_caption', '')}\n\n— Admin Team",
-                        parse_mode="Markdown"
-                    )
-                elif message_type == 'document':
-                    await context.bot.send_document(
-                        chat_id=target_user_id,
-                        document=context.user_data.get('broadcast_document'),
-                        caption=f"📢 **MESSAGE FROM ADMIN**\n\n{context.user_data.get('broadcast_caption', '')}\n\n— Admin Team",
-                        parse_mode="Markdown"
-                    )
+                await self._send_broadcast_content(context, target_user_id, "📢 **MESSAGE FROM ADMIN**")
                 
-                self.log_admin_action(
+                await self.run_sheets_io(
+                    self.log_admin_action,
                     admin_id=user.id,
                     admin_username=user.username or str(user.id),
                     action="BROADCAST_SINGLE",
@@ -456,12 +473,52 @@ class AdminCommands:
         self._clear_broadcast_context(context)
         return ConversationHandler.END
     
+    def _get_broadcast_recipients(self) -> List[Dict]:
+        """All users minus banned ones, filtered from the single get_all_users fetch"""
+        return [u for u in self.get_all_users() if str(u.get('banned', 'FALSE')).upper() != 'TRUE']
+    
+    async def _send_broadcast_content(self, context, chat_id: int, header: str):
+        """Send the broadcast stored in context.user_data to a single chat"""
+        message_type = context.user_data.get('broadcast_message_type', 'text')
+        
+        if message_type == 'text':
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=f"{header}\n\n{context.user_data.get('broadcast_content', '')}\n\n— Admin Team",
+                parse_mode="Markdown"
+            )
+            return
+        
+        caption = f"{header}\n\n{context.user_data.get('broadcast_caption', '')}\n\n— Admin Team"
+        if message_type == 'photo':
+            await context.bot.send_photo(
+                chat_id=chat_id,
+                photo=context.user_data.get('broadcast_photo'),
+                caption=caption,
+                parse_mode="Markdown"
+            )
+        elif message_type == 'video':
+            await context.bot.send_video(
+                chat_id=chat_id,
+                video=context.user_data.get('broadcast_video'),
+                caption=caption,
+                parse_mode="Markdown"
+            )
+        elif message_type == 'document':
+            await context.bot.send_document(
+                chat_id=chat_id,
+                document=context.user_data.get('broadcast_document'),
+                caption=caption,
+                parse_mode="Markdown"
+            )
+    
     def _clear_broadcast_context(self, context):
         """Clear broadcast context data"""
         keys_to_remove = [
             'broadcast_type', 'broadcast_message_type', 'broadcast_content',
             'broadcast_photo', 'broadcast_video', 'broadcast_document',
-            'broadcast_caption', 'broadcast_target_user_id', 'broadcast_target_username'
+            'broadcast_caption', 'broadcast_target_user_id', 'broadcast_target_username',
+            'broadcast_rows'
         ]
         for key in keys_to_remove:
             if key in context.user_data:
@@ -494,11 +551,11 @@ class AdminCommands:
     # =============== BOT STATUS FEATURE ===============
     async def handle_bot_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await update.message.reply_text("You are not authorized.")
             return
         
-        current_status = self.get_bot_status()
+        current_status = await self.run_sheets_io(self.get_bot_status)
         status_text = "🟢 ACTIVE" if current_status else "🔴 INACTIVE"
         
         keyboard = InlineKeyboardMarkup([
@@ -522,22 +579,22 @@ class AdminCommands:
         await query.answer()
         
         user = query.from_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await query.message.edit_text("You are not authorized.")
             return
         
         action = query.data
         
         if action == "bot_activate":
-            self.set_bot_status(True)
+            await self.run_sheets_io(self.set_bot_status, True)
             status = "🟢 ACTIVATED"
             action_text = "activated"
         elif action == "bot_deactivate":
-            self.set_bot_status(False)
+            await self.run_sheets_io(self.set_bot_status, False)
             status = "🔴 DEACTIVATED"
             action_text = "deactivated"
         elif action == "bot_refresh":
-            current_status = self.get_bot_status()
+            current_status = await self.run_sheets_io(self.get_bot_status)
             status_text = "🟢 ACTIVE" if current_status else "🔴 INACTIVE"
             
             keyboard = InlineKeyboardMarkup([
@@ -558,14 +615,15 @@ class AdminCommands:
             return
         
         if action in ["bot_activate", "bot_deactivate"]:
-            self.log_admin_action(
+            await self.run_sheets_io(
+                self.log_admin_action,
                 admin_id=user.id,
                 admin_username=user.username or str(user.id),
                 action=f"BOT_{action_text.upper()}",
                 details=f"Bot {action_text}"
             )
         
-        current_status = self.get_bot_status()
+        current_status = await self.run_sheets_io(self.get_bot_status)
         status_text = "🟢 ACTIVE" if current_status else "🔴 INACTIVE"
         
         keyboard = InlineKeyboardMarkup([
@@ -587,7 +645,7 @@ class AdminCommands:
     # =============== CASH CONTROL FEATURE ===============
     async def start_cash_control(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         user = update.effective_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await update.message.reply_text("You are not authorized to use Cash Control.", reply_markup=self.get_admin_keyboard())
             return ConversationHandler.END
         
@@ -596,7 +654,7 @@ class AdminCommands:
             "Please enter the **User ID (number)** or **Username (@...)** of the user whose balance you want to modify.\n\n"
             "Type '🚫 Cancel' to cancel.",
             parse_mode="Markdown",
-            reply_markup=ReplyKeyboardMarkup([["🚫 Cancel"]], resize_keyboard=True)
+            reply_markup=ADMIN_CANCEL_KEYBOARD
         )
         
         return AWAIT_CASH_CONTROL_ID
@@ -627,6 +685,29 @@ class AdminCommands:
             logger.error("Error get_user_data_from_sheet: %s", e)
             return {"user_id": str(user_id), "username": "N/A", "coin_balance": "0"}
     
+    async def _adjust_user_balance(self, user_id: int, change: int) -> Optional[Tuple[int, int]]:
+        """Fallback balance change from a fresh read; nothing is written if it would go negative"""
+        row = await self.run_sheets_io(self.find_user_row, user_id)
+        if not row:
+            return None
+        try:
+            row_values = await self.run_sheets_io(self.ws_user_data.row_values, row)
+            old_balance = int(row_values[2].strip()) if len(row_values) > 2 else 0
+        except ValueError:
+            old_balance = 0
+        except Exception as e:
+            logger.error("Error reading balance for cash control: %s", e)
+            return None
+        new_balance = old_balance + change
+        if new_balance >= 0:
+            try:
+                await self.run_sheets_io(self.ws_user_data.update_cell, row, 3, new_balance)
+            except Exception as e:
+                logger.error("Error writing balance for cash control: %s", e)
+                return None
+            self.update_cached_user(user_id, coin_balance=str(new_balance))
+        return old_balance, new_balance
+    
     async def cash_control_get_id(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         input_identifier = update.message.text.strip()
         user_id_int = None
@@ -634,33 +715,33 @@ class AdminCommands:
         
         if input_identifier.isdigit():
             user_id_int = int(input_identifier)
-            if self.find_user_row(user_id_int):
-                user_data = self.get_user_data_from_sheet(user_id_int)
+            if await self.run_sheets_io(self.find_user_row, user_id_int):
+                user_data = await self.run_sheets_io(self.get_user_data_from_sheet, user_id_int)
                 target_username = user_data.get("username", f"ID:{user_id_int}")
         
         elif input_identifier.startswith('@'):
             target_username = input_identifier
             try:
-                cell = self.ws_user_data.find(target_username, in_column=2)
+                cell = await self.run_sheets_io(self.ws_user_data.find, target_username, in_column=2)
                 if cell:
-                    user_id_int = int(self.ws_user_data.cell(cell.row, 1).value)
+                    user_id_int = int((await self.run_sheets_io(self.ws_user_data.cell, cell.row, 1)).value)
             except Exception:
                 pass
         
         else:
             target_username = "@" + input_identifier
             try:
-                cell = self.ws_user_data.find(target_username, in_column=2)
+                cell = await self.run_sheets_io(self.ws_user_data.find, target_username, in_column=2)
                 if cell:
-                    user_id_int = int(self.ws_user_data.cell(cell.row, 1).value)
+                    user_id_int = int((await self.run_sheets_io(self.ws_user_data.cell, cell.row, 1)).value)
             except Exception:
                 pass
         
-        if not user_id_int or not self.find_user_row(user_id_int):
+        if not user_id_int or not await self.run_sheets_io(self.find_user_row, user_id_int):
             await update.message.reply_text("❌ User not found or ID/Username is invalid. Please try again or type '🚫 Cancel'.")
             return AWAIT_CASH_CONTROL_ID
         
-        user_data = self.get_user_data_from_sheet(user_id_int)
+        user_data = await self.run_sheets_io(self.get_user_data_from_sheet, user_id_int)
         current_balance = user_data.get('coin_balance', '0')
         
         context.user_data['target_cash_control_id'] = user_id_int
@@ -675,7 +756,7 @@ class AdminCommands:
             "Use **-** for subtracting (e.g., `-100`)\n\n"
             "Type '🚫 Cancel' to cancel.",
             parse_mode="Markdown",
-            reply_markup=ReplyKeyboardMarkup([["🚫 Cancel"]], resize_keyboard=True)
+            reply_markup=ADMIN_CANCEL_KEYBOARD
         )
         
         return AWAIT_CASH_CONTROL_AMOUNT
@@ -684,7 +765,6 @@ class AdminCommands:
         amount_text = update.message.text.strip()
         target_user_id = context.user_data.get('target_cash_control_id')
         target_user_name = context.user_data.get('target_cash_control_name', f"ID:{target_user_id}")
-        current_balance = context.user_data.get('current_coin_balance', '0')
         admin_user = update.effective_user
         
         if not target_user_id:
@@ -702,15 +782,11 @@ class AdminCommands:
             await update.message.reply_text("❌ The number provided is too large or not a valid integer.")
             return AWAIT_CASH_CONTROL_AMOUNT
         
-        user_row = self.find_user_row(target_user_id)
+        # Re-reads the balance under the user's lock; the one shown in the previous step may be stale
+        result = await self.adjust_user_balance(target_user_id, coin_change)
         
-        if user_row:
-            try:
-                old_balance = int(current_balance)
-            except ValueError:
-                old_balance = 0
-                
-            new_balance = old_balance + coin_change
+        if result is not None:
+            old_balance, new_balance = result
             
             if new_balance < 0:
                 await update.message.reply_text(
@@ -719,8 +795,6 @@ class AdminCommands:
                 )
                 return AWAIT_CASH_CONTROL_AMOUNT
             
-            self.ws_user_data.update_cell(user_row, 3, new_balance)
-            
             if coin_change > 0:
                 action_text = "Added"
                 action_emoji = "🟢"
@@ -751,7 +825,8 @@ class AdminCommands:
             
             await update.message.reply_text(admin_success_msg, parse_mode="Markdown", reply_markup=keyboard)
             
-            self.log_admin_action(
+            await self.run_sheets_io(
+                self.log_admin_action,
                 admin_id=admin_user.id,
                 admin_username=admin_user.username or str(admin_user.id),
                 action="CASH_CONTROL",
@@ -775,7 +850,7 @@ class AdminCommands:
                     await update.message.reply_text(f"⚠️ Warning: Could not send notification to user ID {target_user_id}. Error: {e}", reply_markup=self.get_admin_keyboard())
         
         else:
-            await update.message.reply_text("❌ Error: Target user row could not be located.", reply_markup=self.get_admin_keyboard())
+            await update.message.reply_text("❌ Error: Target user balance could not be read or updated.", reply_markup=self.get_admin_keyboard())
         
         if 'target_cash_control_id' in context.user_data:
             del context.user_data['target_cash_control_id']
@@ -796,7 +871,7 @@ class AdminCommands:
     # =============== USER SEARCH FEATURE ===============
     async def start_user_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         user = update.effective_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await update.message.reply_text("You are not authorized to use User Search.")
             return ConversationHandler.END
         
@@ -805,7 +880,7 @@ class AdminCommands:
             "Enter User ID, Username, or Phone Number to search:\n\n"
             "Type '🚫 Cancel' to cancel.",
             parse_mode="Markdown",
-            reply_markup=ReplyKeyboardMarkup([["🚫 Cancel"]], resize_keyboard=True)
+            reply_markup=ADMIN_CANCEL_KEYBOARD
         )
         
         return AWAIT_USER_SEARCH
@@ -814,7 +889,7 @@ class AdminCommands:
         search_term = update.message.text.strip()
         
         try:
-            users_data = self.ws_user_data.get_all_records()
+            users_data = await self.run_sheets_io(self.ws_user_data.get_all_records)
             found_users = []
             
             for user in users_data:
@@ -918,7 +993,7 @@ class AdminCommands:
         await query.answer()
         
         user = query.from_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await query.message.edit_text("You are not authorized.")
             return
         
@@ -936,7 +1011,7 @@ class AdminCommands:
         context.user_data['target_cash_control_id'] = target_user_id
         context.user_data['target_cash_control_name'] = f"ID:{target_user_id}"
         
-        user_data = self.get_user_data_from_sheet(target_user_id)
+        user_data = await self.run_sheets_io(self.get_user_data_from_sheet, target_user_id)
         current_balance = user_data.get('coin_balance', '0')
         context.user_data['current_coin_balance'] = current_balance
         
@@ -957,7 +1032,7 @@ class AdminCommands:
         await query.answer()
         
         user = query.from_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await query.message.edit_text("You are not authorized.")
             return
         
@@ -974,7 +1049,7 @@ class AdminCommands:
             return
         
         # Get current user data
-        user_data = self.get_user_data_from_sheet(target_user_id)
+        user_data = await self.run_sheets_io(self.get_user_data_from_sheet, target_user_id)
         current_status = user_data.get('banned', 'FALSE')
         is_banned = str(current_status).upper() == 'TRUE'
         
@@ -983,26 +1058,28 @@ class AdminCommands:
         new_status_text = "TRUE" if new_status else "FALSE"
         
         # Find the row
-        row = self.find_user_row(target_user_id)
+        row = await self.run_sheets_io(self.find_user_row, target_user_id)
         if not row:
             await query.message.edit_text("❌ User not found in database.")
             return
         
         # Update in sheet - Column 7 is banned status
         try:
-            self.ws_user_data.update_cell(row, 7, new_status_text)
+            await self.run_sheets_io(self.ws_user_data.update_cell, row, 7, new_status_text)
         except Exception as e:
             logger.error(f"Error updating banned status: {e}")
             # Try column 8 if column 7 fails
             try:
-                self.ws_user_data.update_cell(row, 8, new_status_text)
+                await self.run_sheets_io(self.ws_user_data.update_cell, row, 8, new_status_text)
             except:
                 await query.message.edit_text("❌ Error updating user status.")
                 return
+        self.update_cached_user(target_user_id, banned=new_status_text)
         
         # Log admin action
         action = "BAN_USER" if new_status else "UNBAN_USER"
-        self.log_admin_action(
+        await self.run_sheets_io(
+            self.log_admin_action,
             admin_id=user.id,
             admin_username=user.username or str(user.id),
             action=action,
@@ -1062,7 +1139,7 @@ class AdminCommands:
         await query.answer()
         
         user = query.from_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await query.message.edit_text("You are not authorized.")
             return
         
@@ -1079,7 +1156,7 @@ class AdminCommands:
         
         # Get user orders
         try:
-            all_orders = self.ws_orders.get_all_records()
+            all_orders = await self.run_sheets_io(self.ws_orders.get_all_records)
             user_orders = []
             for order in all_orders:
                 if str(order.get('user_id', '')) == str(target_user_id):
@@ -1137,7 +1214,7 @@ class AdminCommands:
         await query.answer()
         
         user = query.from_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await query.message.edit_text("You are not authorized.")
             return
         
@@ -1153,7 +1230,7 @@ class AdminCommands:
             return
         
         # Get current user data
-        user_data = self.get_user_data_from_sheet(target_user_id)
+        user_data = await self.run_sheets_io(self.get_user_data_from_sheet, target_user_id)
         
         keyboard = InlineKeyboardMarkup([
             [
@@ -1201,7 +1278,7 @@ class AdminCommands:
         await query.answer()
         
         user = query.from_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await query.message.edit_text("You are not authorized.")
             return
         
@@ -1220,7 +1297,7 @@ class AdminCommands:
         context.user_data['target_cash_control_id'] = target_user_id
         context.user_data['target_cash_control_name'] = f"ID:{target_user_id}"
         
-        user_data = self.get_user_data_from_sheet(target_user_id)
+        user_data = await self.run_sheets_io(self.get_user_data_from_sheet, target_user_id)
         current_balance = user_data.get('coin_balance', '0')
         context.user_data['current_coin_balance'] = current_balance
         
@@ -1268,19 +1345,19 @@ class AdminCommands:
     # =============== SYSTEM HEALTH FEATURE ===============
     async def handle_system_health(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await update.message.reply_text("You are not authorized.")
             return
         
         try:
             sheets_status = "✅ Connected" if self.ws_user_data else "❌ Disconnected"
-            bot_status = "🟢 Active" if self.get_bot_status() else "🔴 Inactive"
-            user_count = len(self.get_all_users())
-            pending_orders = len(self.get_pending_orders())
+            bot_status = "🟢 Active" if await self.run_sheets_io(self.get_bot_status) else "🔴 Inactive"
+            user_count = len(await self.run_sheets_io(self.get_all_users))
+            pending_orders = len(await self.run_sheets_io(self.get_pending_orders))
             
             recent_errors = 0
             try:
-                logs = self.ws_admin_logs.get_all_records()
+                logs = await self.run_sheets_io(self.ws_admin_logs.get_all_records)
                 twenty_four_hours_ago = datetime.datetime.now() - datetime.timedelta(hours=24)
                 
                 for log in logs:
@@ -1388,7 +1465,7 @@ class AdminCommands:
     # =============== DATA EXPORT FEATURE ===============
     async def start_data_export(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         user = update.effective_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await update.message.reply_text("You are not authorized to use Data Export.")
             return ConversationHandler.END
         
@@ -1412,7 +1489,7 @@ class AdminCommands:
         await query.answer()
         
         user = query.from_user
-        if not self.is_multi_admin(user.id):
+        if not await self.ais_multi_admin(user.id):
             await query.message.edit_text("You are not authorized.")
             return ConversationHandler.END
         
@@ -1424,17 +1501,17 @@ class AdminCommands:
         
         try:
             if export_type == "users":
-                data = self.ws_user_data.get_all_records()
+                data = await self.run_sheets_io(self.ws_user_data.get_all_records)
                 filename = f"users_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
                 fieldnames = ['user_id', 'username', 'coin_balance', 'registration_date', 'last_active', 'total_purchase', 'banned']
                 
             elif export_type == "orders":
-                data = self.ws_orders.get_all_records()
+                data = await self.run_sheets_io(self.ws_orders.get_all_records)
                 filename = f"orders_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
                 fieldnames = ['order_id', 'user_id', 'username', 'product_key', 'price_mmk', 'phone', 'premium_username', 'status', 'timestamp', 'notes', 'processed_by']
                 
             elif export_type == "logs":
-                data = self.ws_admin_logs.get_all_records()
+                data = await self.run_sheets_io(self.ws_admin_logs.get_all_records)
                 filename = f"logs_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
                 fieldnames = ['timestamp', 'admin_id', 'admin_username', 'action', 'target_user', 'details', 'ip_address', 'user_agent']
             
@@ -1456,7 +1533,8 @@ class AdminCommands:
                 caption=f"✅ {export_type.title()} export completed.\n\n📅 Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             )
             
-            self.log_admin_action(
+            await self.run_sheets_io(
+                self.log_admin_action,
                 admin_id=user.id,
                 admin_username=user.username or str(user.id),
                 action="DATA_EXPORT",
@@ -1485,14 +1563,4 @@ class AdminCommands:
     # =============== HELPER METHODS ===============
     def get_admin_keyboard(self):
         """Get admin reply keyboard"""
-        return ReplyKeyboardMarkup(
-            [
-                [KeyboardButton("👤 User Info"), KeyboardButton("💰 Payment Method")],
-                [KeyboardButton("❓ Help Center"), KeyboardButton("✨ Premium & Star")],
-                [KeyboardButton("👾 Broadcast"), KeyboardButton("⚙️ Bot Status")],
-                [KeyboardButton("📝 Cash Control"), KeyboardButton("👤 User Search")],
-                [KeyboardButton("📈 System Health"), KeyboardButton("📤 Data Export")]
-            ],
-            resize_keyboard=True,
-            one_time_keyboard=False
-            )
+        return ADMIN_KEYBOARD
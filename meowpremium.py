@@ -5,8 +5,12 @@ import logging
 import json
 import datetime
 import re
-import uuid
+import secrets
+import random
 import asyncio
+import functools
+import weakref
+import collections
 from typing import Dict, Optional, List, Tuple
 import gspread
 from google.auth.transport.requests import Request
@@ -17,7 +21,9 @@ from telegram import (
     KeyboardButton,
     ReplyKeyboardMarkup,
 )
+from telegram.error import BadRequest, NetworkError, TimedOut
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CommandHandler,
     MessageHandler,
@@ -26,6 +32,7 @@ from telegram.ext import (
     ConversationHandler,
     CallbackQueryHandler,
 )
+from telegram.request import HTTPXRequest
 
 # Import admin commands
 from admincommands import (
@@ -53,17 +60,71 @@ SHEET_ID = os.environ.get("SHEET_ID", "")
 GSPREAD_SA_JSON = os.environ.get("GSPREAD_SA_JSON", "")
 BOT_TOKEN = os.environ.get("BOT_TOKEN", "")
 RENDER_EXTERNAL_URL = os.environ.get("RENDER_EXTERNAL_URL", "")
-PORT = int(os.environ.get("PORT", "8080"))
+
+
+def _public_base_url() -> str:
+    """Public HTTPS base URL for webhook mode, from WEBHOOK_URL or the hosting platform."""
+    url = os.environ.get("WEBHOOK_URL") or RENDER_EXTERNAL_URL
+    if url:
+        return url
+    railway_host = os.environ.get("RAILWAY_PUBLIC_DOMAIN") or os.environ.get("RAILWAY_STATIC_URL")
+    if railway_host:
+        return railway_host if railway_host.startswith("https://") else f"https://{railway_host}"
+    fly_app = os.environ.get("FLY_APP_NAME")
+    if fly_app:
+        return f"https://{fly_app}.fly.dev"
+    return ""
+
+
+WEBHOOK_URL = _public_base_url()
+# Long polling is only meant for local development
+DEV_MODE = os.environ.get("DEV_MODE", "") == "1"
+# Stale updates queued while the bot was down are skipped unless PROCESS_PENDING=1
+DROP_PENDING_UPDATES = os.environ.get("PROCESS_PENDING", "") != "1"
+# Update types the bot handles; Telegram does not send the rest
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+# Telegram echoes it in X-Telegram-Bot-Api-Secret-Token and PTB rejects mismatches;
+# derived from the token when not configured so the webhook is never left open
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET") or (f"meow-{BOT_TOKEN[-8:]}" if BOT_TOKEN else None)
+# Parsed and range-checked in main() so a bad value logs an error instead of a traceback
+PORT = os.environ.get("PORT", "8080")
 
 # Sheets global objects
 GSHEET_CLIENT: Optional[gspread.Client] = None
+SPREADSHEET: Optional[gspread.Spreadsheet] = None
 WS_USER_DATA = None
 WS_CONFIG = None
 WS_ORDERS = None
 WS_ADMIN_LOGS = None
+SHEETS_INIT_MAX_BACKOFF = 8.0
+
+# user_id -> sheet row index for WS_USER_DATA (rebuilt with USERS_CACHE)
+USER_ROW_INDEX: Dict[str, int] = {}
+
+# user_id -> user dict (_read_all_users shape) for broadcasts; kept current by the
+# user mutation helpers and fully reloaded after USERS_CACHE_TTL_SECONDS
+USERS_CACHE: Dict[int, Dict] = {}
+USERS_CACHE_TS = 0.0
+USERS_CACHE_TTL_SECONDS = int(os.environ.get("USERS_CACHE_TTL_SECONDS", "600"))
+# user_id -> when that entry was last read on its own; display and ban checks re-read
+# entries older than USER_DATA_TTL_SECONDS so sheet edits (e.g. bans) apply quickly
+USER_READ_TS: Dict[int, float] = {}
+USER_DATA_TTL_SECONDS = int(os.environ.get("USER_DATA_TTL_SECONDS", "15"))
 
 # Config cache
-CONFIG_CACHE: Dict = {"data": {}, "ts": 0}
+class _ConfigCache:
+    __slots__ = ("data", "ts", "admin_id", "admin_ids", "products")
+
+    def __init__(self):
+        self.data: Dict[str, str] = {}
+        self.ts: float = 0.0
+        self.admin_id: int = ADMIN_ID
+        self.admin_ids: frozenset = frozenset({ADMIN_ID})
+        # product key -> {"mmk": price, "coins": price in coins}
+        self.products: Dict[str, Dict[str, int]] = {}
+
+
+CONFIG_CACHE = _ConfigCache()
 CONFIG_TTL_SECONDS = int(os.environ.get("CONFIG_TTL_SECONDS", "25"))
 
 # Conversation states
@@ -79,9 +140,27 @@ CONFIG_TTL_SECONDS = int(os.environ.get("CONFIG_TTL_SECONDS", "25"))
 # Bot status
 BOT_ACTIVE = True
 
+# ------------ Helper: Timestamps ----------------
+# (unix second, formatted string); strftime runs at most once per second. Replaced
+# as one tuple so worker threads never see a second paired with another second's string.
+_TS_CACHE: Tuple[int, str] = (0, "")
+
+
+def utcnow_str() -> str:
+    """Current UTC time as "%Y-%m-%d %H:%M:%S", cached at one-second resolution."""
+    global _TS_CACHE
+    t = int(time.time())
+    cached_t, cached_s = _TS_CACHE
+    if t == cached_t:
+        return cached_s
+    s = datetime.datetime.fromtimestamp(t, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    _TS_CACHE = (t, s)
+    return s
+
+
 # ------------ Helper: Retry wrapper for sheet init ----------------
-def initialize_sheets(retries: int = 3, backoff: float = 2.0) -> bool:
-    global GSHEET_CLIENT, WS_USER_DATA, WS_CONFIG, WS_ORDERS, WS_ADMIN_LOGS
+async def initialize_sheets(retries: int = 3, backoff: float = 2.0) -> bool:
+    global GSHEET_CLIENT, SPREADSHEET, WS_USER_DATA, WS_CONFIG, WS_ORDERS, WS_ADMIN_LOGS
 
     if not GSPREAD_SA_JSON:
         logger.error("GSPREAD_SA_JSON environment variable not set.")
@@ -96,6 +175,7 @@ def initialize_sheets(retries: int = 3, backoff: float = 2.0) -> bool:
             sa_credentials = json.loads(GSPREAD_SA_JSON)
             GSHEET_CLIENT = gspread.service_account_from_dict(sa_credentials)
             sheet = GSHEET_CLIENT.open_by_key(SHEET_ID)
+            SPREADSHEET = sheet
 
             WS_USER_DATA = sheet.worksheet("user_data")
             WS_CONFIG = sheet.worksheet("config")
@@ -113,6 +193,9 @@ def initialize_sheets(retries: int = 3, backoff: float = 2.0) -> bool:
                     "target_user", "details", "ip_address", "user_agent"
                 ])
 
+            # Raises into the retry loop: starting with an empty USER_ROW_INDEX
+            # would make every /start look like a new user
+            logger.info("Loaded %d users.", load_users_cache())
             logger.info("✅ Google Sheets initialized successfully.")
             return True
         except Exception as e:
@@ -120,7 +203,10 @@ def initialize_sheets(retries: int = 3, backoff: float = 2.0) -> bool:
             logger.warning(
                 f"Attempt {attempt}/{retries} - failed to initialize Google Sheets: {e}"
             )
-            time.sleep(backoff * attempt)
+            if attempt < retries:
+                # Exponential backoff with jitter; awaiting keeps the event loop responsive
+                delay = min(SHEETS_INIT_MAX_BACKOFF, backoff * (2 ** (attempt - 1)))
+                await asyncio.sleep(delay + random.random() * 0.3)
 
     logger.error("❌ Could not initialize Google Sheets after retries: %s", last_exc)
     return False
@@ -134,28 +220,32 @@ def _read_config_sheet() -> Dict[str, str]:
         logger.warning("WS_CONFIG is not initialized.")
         return out
     try:
-        records = WS_CONFIG.get_all_records()
-        for item in records:
-            k = item.get("key")
-            v = item.get("value")
-            if k is not None and v is not None:
-                out[str(k).strip()] = str(v).strip()
+        # Plain key/value rows below the header; skips get_all_records' per-row dicts
+        values = WS_CONFIG.get_values("A2:B")
+        out = {row[0].strip(): row[1].strip() for row in values if len(row) >= 2 and row[0].strip()}
     except Exception as e:
         logger.error("Error reading config sheet: %s", e)
     return out
 
 
 def get_config_data(force_refresh: bool = False) -> Dict[str, str]:
-    global CONFIG_CACHE
+    cache = CONFIG_CACHE
     now = time.time()
-    if force_refresh or (now - CONFIG_CACHE["ts"] > CONFIG_TTL_SECONDS):
-        CONFIG_CACHE["data"] = _read_config_sheet()
-        CONFIG_CACHE["ts"] = now
-    return CONFIG_CACHE["data"]
+    if force_refresh or (now - cache.ts > CONFIG_TTL_SECONDS):
+        cache.data = _read_config_sheet()
+        cache.admin_id = _parse_admin_id(cache.data)
+        cache.admin_ids = _parse_admin_ids(cache.data, cache.admin_id)
+        cache.products = _build_product_table(cache.data)
+        cache.ts = now
+    return cache.data
 
 
-def get_dynamic_admin_id(config: Dict) -> int:
-    """Retrieves ADMIN_ID from config sheet, falls back to global ADMIN_ID."""
+def invalidate_config_cache() -> None:
+    """Force the next get_config_data() call to re-read the config sheet."""
+    CONFIG_CACHE.ts = 0.0
+
+
+def _parse_admin_id(config: Dict) -> int:
     try:
         return int(config.get("admin_contact_id", ADMIN_ID))
     except (ValueError, TypeError):
@@ -163,111 +253,225 @@ def get_dynamic_admin_id(config: Dict) -> int:
         return ADMIN_ID
 
 
-def is_multi_admin(user_id: int) -> bool:
-    """Check if user is in multi-admin list"""
-    config = get_config_data()
+def get_dynamic_admin_id(config: Dict) -> int:
+    """Retrieves ADMIN_ID from config sheet, falls back to global ADMIN_ID."""
+    # The cached config already has its admin id parsed at refresh time
+    if config is CONFIG_CACHE.data:
+        return CONFIG_CACHE.admin_id
+    return _parse_admin_id(config)
+
+
+PRODUCT_TYPES = ("star", "premium")
+
+
+def _coin_rate(config: Dict, product_type: str) -> float:
+    try:
+        coin_rate_mmk = float(config.get(f"coin_rate_{product_type}", "1000"))
+    except ValueError:
+        coin_rate_mmk = 1000.0
+    return coin_rate_mmk if coin_rate_mmk > 0 else 1000.0
+
+
+def _build_product_table(config: Dict) -> Dict[str, Dict[str, int]]:
+    """MMK and coin prices for every valid star_/premium_ config key."""
+    rates = {t: _coin_rate(config, t) for t in PRODUCT_TYPES}
+    products = {}
+    for key, value in config.items():
+        product_type = key.split("_", 1)[0]
+        if product_type not in rates or not value:
+            continue
+        try:
+            price_mmk = int(value)
+        except ValueError:
+            continue
+        products[key] = {"mmk": price_mmk, "coins": max(1, int(price_mmk / rates[product_type]))}
+    return products
+
+
+def _parse_admin_ids(config: Dict, main_admin: int) -> frozenset:
+    """Main admin plus everyone in multi_admin_ids (ignored if malformed)."""
     admins_str = config.get("multi_admin_ids", "")
     if not admins_str:
-        return user_id == get_dynamic_admin_id(config)
-    
+        return frozenset({main_admin})
     try:
-        admin_ids = [int(x.strip()) for x in admins_str.split(",") if x.strip()]
-        return user_id in admin_ids or user_id == get_dynamic_admin_id(config)
-    except:
-        return user_id == get_dynamic_admin_id(config)
+        admin_ids = {int(x.strip()) for x in admins_str.split(",") if x.strip()}
+    except ValueError:
+        return frozenset({main_admin})
+    admin_ids.add(main_admin)
+    return frozenset(admin_ids)
+
+
+def is_multi_admin(user_id: int) -> bool:
+    """Check if user is in multi-admin list"""
+    get_config_data()
+    return user_id in CONFIG_CACHE.admin_ids
+
+
+def require_admin(handler):
+    """Decorator for handlers that only admins may run."""
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not await ais_multi_admin(update.effective_user.id):
+            if update.callback_query:
+                await update.callback_query.answer()
+            await update.effective_message.reply_text("You are not authorized to perform this action.")
+            return None
+        return await handler(update, context)
+    return wrapper
 
 
 # ------------ User data helpers ----------------
-def find_user_row(user_id: int) -> Optional[int]:
-    global WS_USER_DATA
+UPDATED_RANGE_ROW_RE = re.compile(r"![A-Z]+(\d+)")
+
+
+def refresh_user_row_index() -> None:
+    """Download the user_id column once and rebuild the user_id -> row index."""
+    global USER_ROW_INDEX
     if not WS_USER_DATA:
-        return None
+        return
     try:
-        cell = WS_USER_DATA.find(str(user_id), in_column=1)
-        if cell:
-            return cell.row
+        col = WS_USER_DATA.col_values(1)
+        USER_ROW_INDEX = {uid: i + 1 for i, uid in enumerate(col) if uid.isdigit()}
+        logger.info("Indexed %d user rows.", len(USER_ROW_INDEX))
     except Exception as e:
-        logger.debug("find_user_row exception: %s", e)
-    return None
+        logger.error("Error building user row index: %s", e)
+
+
+def _parse_user_row(user_id: int, row_values: List[str]) -> Dict[str, str]:
+    coin_balance_raw = row_values[2] if len(row_values) > 2 else "0"
+    clean_coin_balance = coin_balance_raw.strip()
+
+    return {
+        "user_id": row_values[0] if len(row_values) > 0 else str(user_id),
+        "username": row_values[1] if len(row_values) > 1 else "N/A",
+        "coin_balance": clean_coin_balance,
+        "registration_date": row_values[3] if len(row_values) > 3 else "N/A",
+        "last_active": row_values[4] if len(row_values) > 4 else "",
+        "total_purchase": row_values[5] if len(row_values) > 5 else "0",
+        "banned": row_values[6] if len(row_values) > 6 else "FALSE",
+    }
+
+
+def _locate_user_row(user_id: int) -> Optional[Tuple[int, List[str]]]:
+    """(row number, row values) of the user's row, checked against column A.
+
+    USER_ROW_INDEX is only rebuilt with USERS_CACHE, so a sorted or edited sheet
+    can leave it pointing at someone else; on a mismatch or miss the row is found
+    with a server-side find() and the index entry corrected.
+    """
+    key = str(user_id)
+    row = USER_ROW_INDEX.get(key)
+    if row:
+        values = WS_USER_DATA.row_values(row)
+        if values and values[0] == key:
+            return row, values
+    cell = WS_USER_DATA.find(key, in_column=1)
+    if not cell:
+        USER_ROW_INDEX.pop(key, None)
+        return None
+    USER_ROW_INDEX[key] = cell.row
+    return cell.row, WS_USER_DATA.row_values(cell.row)
+
+
+def _read_user_row(user_id: int) -> Optional[Tuple[int, Dict[str, str]]]:
+    """Read the user's verified row and store it in USERS_CACHE; None if unknown."""
+    located = _locate_user_row(user_id)
+    if located is None:
+        return None
+    row, values = located
+    data = _parse_user_row(user_id, values)
+    USERS_CACHE[int(user_id)] = dict(data)
+    USER_READ_TS[int(user_id)] = time.time()
+    return row, data
+
+
+def _default_user_data(user_id: int) -> Dict[str, str]:
+    return {"user_id": str(user_id), "username": "N/A", "coin_balance": "0", 
+            "registration_date": "N/A", "banned": "FALSE"}
 
 
 def get_user_data_from_sheet(user_id: int) -> Dict[str, str]:
     global WS_USER_DATA
-    default = {"user_id": str(user_id), "username": "N/A", "coin_balance": "0", 
-               "registration_date": "N/A", "banned": "FALSE"}
+    default = _default_user_data(user_id)
     if not WS_USER_DATA:
         return default
     try:
-        row = find_user_row(user_id)
-        if not row:
-            return default
-        row_values = WS_USER_DATA.row_values(row)
-
-        coin_balance_raw = row_values[2] if len(row_values) > 2 else "0"
-        clean_coin_balance = coin_balance_raw.strip()
-        
-        data = {
-            "user_id": row_values[0] if len(row_values) > 0 else str(user_id),
-            "username": row_values[1] if len(row_values) > 1 else "N/A",
-            "coin_balance": clean_coin_balance,
-            "registration_date": row_values[3] if len(row_values) > 3 else "N/A",
-            "last_active": row_values[4] if len(row_values) > 4 else "",
-            "total_purchase": row_values[5] if len(row_values) > 5 else "0",
-            "banned": row_values[6] if len(row_values) > 6 else "FALSE",
-        }
-        return data
+        located = _read_user_row(user_id)
+        return located[1] if located else default
     except Exception as e:
         logger.error("Error get_user_data_from_sheet: %s", e)
         return default
 
 
-def register_user_if_not_exists(user_id: int, username: str) -> None:
-    global WS_USER_DATA
+def read_user_for_update(user_id: int) -> Optional[Tuple[int, Dict[str, str]]]:
+    """Fresh (row, data) for a balance change; None on a missing user or failed read, never a default."""
     if not WS_USER_DATA:
-        logger.error("WS_USER_DATA not available.")
-        return
+        return None
     try:
-        if find_user_row(user_id) is None:
-            now = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-            new_row = [str(user_id), username or "N/A", "0", now, now, "0", "FALSE"]
-            WS_USER_DATA.append_row(new_row, value_input_option="USER_ENTERED")
-            logger.info("Registered new user %s", user_id)
+        return _read_user_row(user_id)
     except Exception as e:
-        logger.error("Error registering user: %s", e)
+        logger.error("Error read_user_for_update: %s", e)
+        return None
 
 
-def update_user_balance(user_id: int, new_balance: int) -> bool:
-    global WS_USER_DATA
-    row = find_user_row(user_id)
-    if not row:
-        logger.error("update_user_balance: user row not found for %s", user_id)
-        return False
-    try:
-        WS_USER_DATA.update_cell(row, 3, str(new_balance))
-        WS_USER_DATA.update_cell(row, 5, datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
-        return True
-    except Exception as e:
-        logger.error("Failed to update user balance: %s", e)
-        return False
+def _append_new_user(user_id: int, username: str) -> List[str]:
+    now = utcnow_str()
+    new_row = [str(user_id), username or "N/A", "0", now, now, "0", "FALSE"]
+    resp = WS_USER_DATA.append_row(new_row, value_input_option="USER_ENTERED")
+    updated_range = (resp or {}).get("updates", {}).get("updatedRange", "")
+    m = UPDATED_RANGE_ROW_RE.search(updated_range)
+    if m:
+        USER_ROW_INDEX[str(user_id)] = int(m.group(1))
+    else:
+        refresh_user_row_index()
+    USERS_CACHE[user_id] = _parse_user_row(user_id, new_row)
+    logger.info("Registered new user %s", user_id)
+    return new_row
+
+
+def start_bootstrap(user_id: int, username: str) -> Dict[str, str]:
+    """Register the user if needed and return their data.
+
+    An index miss is confirmed with a server-side find() before appending, so an
+    incomplete USER_ROW_INDEX never registers an existing user a second time.
+    """
+    if WS_USER_DATA:
+        try:
+            located = _read_user_row(user_id)
+            if located is not None:
+                return located[1]
+            return _parse_user_row(user_id, _append_new_user(user_id, username))
+        except Exception as e:
+            logger.error("Error registering user: %s", e)
+    return get_user_data_from_sheet(user_id)
+
+
+def batch_write(updates: List[Tuple[str, List[List[str]]]]) -> None:
+    """Write several A1 ranges in one values.batchUpdate request."""
+    SPREADSHEET.values_batch_update({
+        "valueInputOption": "USER_ENTERED",
+        "data": [{"range": r, "values": v} for r, v in updates],
+    })
 
 
 def set_user_banned_status(user_id: int, banned: bool) -> bool:
     global WS_USER_DATA
-    row = find_user_row(user_id)
-    if not row:
-        logger.error("set_user_banned_status: user row not found for %s", user_id)
-        return False
     try:
-        WS_USER_DATA.update_cell(row, 7, "TRUE" if banned else "FALSE")
+        located = _locate_user_row(user_id)
+        if located is None:
+            logger.error("set_user_banned_status: user row not found for %s", user_id)
+            return False
+        row = located[0]
+        batch_write([(f"'{WS_USER_DATA.title}'!G{row}", [["TRUE" if banned else "FALSE"]])])
+        update_cached_user(user_id, banned="TRUE" if banned else "FALSE")
         return True
     except Exception as e:
         logger.error("Failed to update banned status: %s", e)
         return False
 
 
-def is_user_banned(user_id: int) -> bool:
-    data = get_user_data_from_sheet(user_id)
-    return str(data.get("banned", "FALSE")).upper() == "TRUE"
+def is_banned(user_data: Dict) -> bool:
+    return str(user_data.get("banned", "FALSE")).upper() == "TRUE"
 
 
 def log_admin_action(admin_id: int, admin_username: str, action: str, 
@@ -278,7 +482,7 @@ def log_admin_action(admin_id: int, admin_username: str, action: str,
         return False
     
     try:
-        timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = utcnow_str()
         row = [
             timestamp,
             str(admin_id),
@@ -297,57 +501,165 @@ def log_admin_action(admin_id: int, admin_username: str, action: str,
 
 
 # ------------ Orders logging ----------------
+def _order_row(order: Dict) -> List:
+    # Leading ' keeps USER_ENTERED from reading hex ids like "12e345678901" as numbers
+    return [
+        "'" + (order.get("order_id") or secrets.token_hex(6)),
+        order.get("user_id", ""),
+        order.get("username", ""),
+        order.get("product_key", ""),
+        str(order.get("price_mmk", "")),
+        order.get("phone", ""),
+        order.get("premium_username", ""),
+        order.get("status", "PENDING"),
+        order.get("timestamp", utcnow_str()),
+        order.get("notes", ""),
+        order.get("processed_by", ""),
+    ]
+
+
 def log_order(order: Dict) -> bool:
     global WS_ORDERS
     if not WS_ORDERS:
         logger.error("WS_ORDERS not initialized.")
         return False
     try:
-        order_id = order.get("order_id") or str(uuid.uuid4())
-        row = [
-            order_id,
-            order.get("user_id", ""),
-            order.get("username", ""),
-            order.get("product_key", ""),
-            str(order.get("price_mmk", "")),
-            order.get("phone", ""),
-            order.get("premium_username", ""),
-            order.get("status", "PENDING"),
-            order.get("timestamp", datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")),
-            order.get("notes", ""),
-            order.get("processed_by", ""),
-        ]
-        WS_ORDERS.append_row(row, value_input_option="USER_ENTERED")
+        WS_ORDERS.append_row(_order_row(order), value_input_option="USER_ENTERED")
         return True
     except Exception as e:
         logger.error("log_order error: %s", e)
         return False
 
 
-def get_all_users() -> List[Dict]:
-    """Get all users from sheet"""
-    global WS_USER_DATA
-    if not WS_USER_DATA:
+def update_balance_and_log_order(user_id: int, row: int, new_balance: int, order: Dict) -> bool:
+    """Write the new balance to `row`, then append the order row.
+
+    `row` is the one read_user_for_update just verified for this user. The order
+    row stays an append_row so it never lands on a row another writer (log_order,
+    a manual edit) already filled. Only a failed balance write returns False; the
+    balance has already moved if the append fails.
+    """
+    try:
+        title = WS_USER_DATA.title
+        batch_write([
+            (f"'{title}'!C{row}", [[str(new_balance)]]),
+            (f"'{title}'!E{row}", [[utcnow_str()]]),
+        ])
+        update_cached_user(user_id, coin_balance=str(new_balance))
+    except Exception as e:
+        logger.error("Failed to update balance and log order: %s", e)
+        return False
+    log_order(order)
+    return True
+
+
+def write_user_balance(user_id: int, row: int, new_balance: int) -> bool:
+    """Set the balance cell of `row`, as verified by read_user_for_update."""
+    try:
+        batch_write([(f"'{WS_USER_DATA.title}'!C{row}", [[str(new_balance)]])])
+        update_cached_user(user_id, coin_balance=str(new_balance))
+        return True
+    except Exception as e:
+        logger.error("Failed to write user balance: %s", e)
+        return False
+
+
+def _read_all_users() -> List[Tuple[int, Dict]]:
+    """(sheet row, user dict) for every user row; raises on Sheets errors."""
+    # Plain list-of-lists plus one header lookup instead of a dict per row
+    rows = WS_USER_DATA.get_all_values()
+    if not rows:
         return []
-    
+    headers = rows[0]
+    fields = [
+        ('user_id', ''),
+        ('username', 'N/A'),
+        ('coin_balance', '0'),
+        ('banned', 'FALSE'),
+        ('last_active', ''),
+        ('registration_date', ''),
+        ('total_purchase', '0'),
+    ]
+    columns = [(name, headers.index(name) if name in headers else None, default)
+               for name, default in fields]
+    users = []
+    for row_num, row in enumerate(rows[1:], start=2):
+        user = {
+            name: (row[idx] if idx < len(row) else '') if idx is not None else default
+            for name, idx, default in columns
+        }
+        if user['user_id']:
+            users.append((row_num, user))
+    return users
+
+
+def load_users_cache(allow_empty: bool = True) -> int:
+    """Replace USERS_CACHE and USER_ROW_INDEX from one sheet read; raises on Sheets errors.
+
+    Returns the number of users loaded. With allow_empty=False an empty read
+    leaves both tables untouched.
+    """
+    global USERS_CACHE, USERS_CACHE_TS, USER_ROW_INDEX
+    users = [(row, u) for row, u in _read_all_users() if str(u['user_id']).isdigit()]
+    if not users and not allow_empty:
+        return 0
+    USERS_CACHE = {int(u['user_id']): u for _, u in users}
+    USER_ROW_INDEX = {u['user_id']: row for row, u in users}
+    USERS_CACHE_TS = time.time()
+    USER_READ_TS.clear()
+    return len(users)
+
+
+def refresh_users_cache() -> None:
+    """Reload USERS_CACHE and USER_ROW_INDEX from one sheet read.
+
+    Keeps the old tables if the read fails or comes back empty.
+    """
+    if not WS_USER_DATA:
+        return
     try:
-        records = WS_USER_DATA.get_all_records()
-        users = []
-        for record in records:
-            if record.get('user_id'):
-                users.append({
-                    'user_id': str(record.get('user_id', '')),
-                    'username': record.get('username', 'N/A'),
-                    'coin_balance': record.get('coin_balance', '0'),
-                    'banned': record.get('banned', 'FALSE'),
-                    'last_active': record.get('last_active', ''),
-                    'registration_date': record.get('registration_date', ''),
-                    'total_purchase': record.get('total_purchase', '0')
-                })
-        return users
+        loaded = load_users_cache(allow_empty=False)
     except Exception as e:
         logger.error("Error getting all users: %s", e)
-        return []
+        loaded = 0
+    if not loaded:
+        logger.warning("User reload returned no rows; keeping %d cached users.", len(USERS_CACHE))
+
+
+def users_cache_stale() -> bool:
+    return time.time() - USERS_CACHE_TS > USERS_CACHE_TTL_SECONDS
+
+
+def user_entry_stale(user_id: int) -> bool:
+    read_at = max(USERS_CACHE_TS, USER_READ_TS.get(int(user_id), 0.0))
+    return time.time() - read_at > USER_DATA_TTL_SECONDS
+
+
+def get_cached_users() -> List[Dict]:
+    """All users from memory; only touches the sheet when the cache has expired."""
+    if users_cache_stale():
+        refresh_users_cache()
+    return list(USERS_CACHE.values())
+
+
+def get_cached_user(user_id: int) -> Optional[Dict[str, str]]:
+    """Copy of the user's cached row, or None if not cached."""
+    user = USERS_CACHE.get(int(user_id))
+    return dict(user) if user is not None else None
+
+
+def coin_balance_of(user_data: Dict) -> int:
+    try:
+        return int(user_data.get("coin_balance", "0"))
+    except ValueError:
+        return 0
+
+
+def update_cached_user(user_id: int, **fields) -> None:
+    """Apply a change that was just written to the sheet to the cached user."""
+    user = USERS_CACHE.get(int(user_id))
+    if user is not None:
+        user.update(fields)
 
 
 def get_pending_orders() -> List[Dict]:
@@ -413,9 +725,7 @@ def update_config_value(key: str, value: str) -> bool:
             # Add new
             WS_CONFIG.append_row([key, value])
         
-        # Clear cache
-        global CONFIG_CACHE
-        CONFIG_CACHE["ts"] = 0
+        invalidate_config_cache()
         return True
     except Exception as e:
         logger.error("Error updating config: %s", e)
@@ -443,51 +753,43 @@ def get_bot_status() -> bool:
 
 
 # ------------ Keyboards ----------------
-def get_payment_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
+PAYMENT_KEYBOARD = InlineKeyboardMarkup(
+    [
         [
-            [
-                InlineKeyboardButton("💸 Kpay (KBZ Pay)", callback_data="pay_kpay"),
-                InlineKeyboardButton("💸 Wave Money", callback_data="pay_wave"),
-            ]
+            InlineKeyboardButton("💸 Kpay (KBZ Pay)", callback_data="pay_kpay"),
+            InlineKeyboardButton("💸 Wave Money", callback_data="pay_wave"),
         ]
-    )
+    ]
+)
+
+
+# product_type -> (CONFIG_CACHE.ts, markup); rebuilt only when the config refreshes
+_PRODUCT_KEYBOARD_CACHE: Dict[str, Tuple[float, InlineKeyboardMarkup]] = {}
 
 
 def get_product_keyboard(product_type: str) -> InlineKeyboardMarkup:
-    config = get_config_data()
+    get_config_data()
+    cached = _PRODUCT_KEYBOARD_CACHE.get(product_type)
+    if cached and cached[0] == CONFIG_CACHE.ts:
+        return cached[1]
+
+    products = CONFIG_CACHE.products
     keyboard_buttons = []
     prefix = f"{product_type}_"
-    product_keys = sorted([k for k in config.keys() if k.startswith(prefix)])
+    product_keys = sorted(k for k in products if k.startswith(prefix))
     
     icon = '⭐' if product_type == 'star' else '❄️'
-    coin_rate_key = f"coin_rate_{product_type}"
-    
-    try:
-        coin_rate_mmk = float(config.get(coin_rate_key, "1000")) 
-    except ValueError:
-        coin_rate_mmk = 1000.0
-
-    if coin_rate_mmk <= 0:
-         coin_rate_mmk = 1000.0
     
     for key in product_keys:
-        price_mmk_str = config.get(key)
-        if price_mmk_str:
-            try:
-                price_mmk = int(price_mmk_str)
-            except ValueError:
-                continue
-            
-            price_coin = int(price_mmk / coin_rate_mmk) 
-            price_coin = max(1, price_coin)
-
-            button_name = key.replace(prefix, "").replace("_", " ").title()
-            button_text = f"{icon} {button_name} ({price_coin} Coins)" 
-            keyboard_buttons.append([InlineKeyboardButton(button_text, callback_data=f"{key}")])
+        price_coin = products[key]["coins"]
+        button_name = key.replace(prefix, "").replace("_", " ").title()
+        button_text = f"{icon} {button_name} ({price_coin} Coins)" 
+        keyboard_buttons.append([InlineKeyboardButton(button_text, callback_data=f"{key}")])
 
     keyboard_buttons.append([InlineKeyboardButton("↩️ Back to Menu", callback_data="menu_back")]) 
-    return InlineKeyboardMarkup(keyboard_buttons)
+    markup = InlineKeyboardMarkup(keyboard_buttons)
+    _PRODUCT_KEYBOARD_CACHE[product_type] = (CONFIG_CACHE.ts, markup)
+    return markup
 
 
 def get_coin_package_keyboard() -> InlineKeyboardMarkup:
@@ -517,17 +819,24 @@ def get_coin_package_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(buttons)
 
 
+# Reply keyboard labels, shared by the keyboards and the ROUTES dispatch table
+BTN_USER_INFO = "👤 User Info"
+BTN_PAYMENT = "💰 Payment Method"
+BTN_HELP = "❓ Help Center"
+BTN_PREMIUM = "✨ Premium & Star"
+BTN_ADMIN_BACK = "🏠 Back to Admin Menu"
+
 ENGLISH_REPLY_KEYBOARD = [
-    [KeyboardButton("👤 User Info"), KeyboardButton("💰 Payment Method")],
-    [KeyboardButton("❓ Help Center"), KeyboardButton("✨ Premium & Star")]
+    [KeyboardButton(BTN_USER_INFO), KeyboardButton(BTN_PAYMENT)],
+    [KeyboardButton(BTN_HELP), KeyboardButton(BTN_PREMIUM)]
 ]
 MAIN_MENU_KEYBOARD = ReplyKeyboardMarkup(ENGLISH_REPLY_KEYBOARD, resize_keyboard=True, one_time_keyboard=False)
 
 
 ADMIN_REPLY_KEYBOARD = ReplyKeyboardMarkup(
     [
-        [KeyboardButton("👤 User Info"), KeyboardButton("💰 Payment Method")],
-        [KeyboardButton("❓ Help Center"), KeyboardButton("✨ Premium & Star")],
+        [KeyboardButton(BTN_USER_INFO), KeyboardButton(BTN_PAYMENT)],
+        [KeyboardButton(BTN_HELP), KeyboardButton(BTN_PREMIUM)],
         [KeyboardButton("👾 Broadcast"), KeyboardButton("⚙️ Bot Status")],
         [KeyboardButton("📝 Cash Control"), KeyboardButton("👤 User Search")],
         [KeyboardButton("📈 System Health"), KeyboardButton("📤 Data Export")]
@@ -537,6 +846,14 @@ ADMIN_REPLY_KEYBOARD = ReplyKeyboardMarkup(
 )
 
 
+BACK_TO_MENU_INLINE_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton("↩️ Back to Menu", callback_data="menu_back")]]
+)
+BACK_TO_PAYMENT_INLINE_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton("↩️ Back to Payment Menu", callback_data="payment_back")]]
+)
+
+
 PRODUCT_SELECTION_INLINE_KEYBOARD = InlineKeyboardMarkup(
     [
         [InlineKeyboardButton("⭐ Telegram Star", callback_data="product_star")],
@@ -551,14 +868,17 @@ CANCEL_KEYBOARD = ReplyKeyboardMarkup(
     resize_keyboard=True,
     one_time_keyboard=True
 )
+CANCEL_HINT = "If you want to stop the order, click '🚫 Cancel Order'."
 
 
 # ------------ Validation helpers ----------------
-PHONE_RE = re.compile(r"^\d{8,15}$")
-USERNAME_RE = re.compile(r"^@?([a-zA-Z0-9_]{5,32})$")
+PHONE_RE = re.compile(r"\d{8,15}")
+USERNAME_RE = re.compile(r"@?([a-zA-Z0-9_]{5,32})")
+_AMOUNT_RE = re.compile(r"\d{3,9}")
+_STRIP_COMMA_DOT = str.maketrans("", "", ",.")
 
 def normalize_username(raw: str) -> str:
-    m = USERNAME_RE.match(raw)
+    m = USERNAME_RE.fullmatch(raw)
     if not m:
         return ""
     return "@" + m.group(1)
@@ -567,24 +887,156 @@ def normalize_username(raw: str) -> str:
 def parse_amount_from_text(text: str) -> Optional[int]:
     if not text:
         return None
-    cleaned = text.replace(",", "").replace(".", "")
-    m = re.search(r"(\d{3,9})", cleaned)
+    m = _AMOUNT_RE.search(text.translate(_STRIP_COMMA_DOT))
     if m:
         try:
-            return int(m.group(1))
+            return int(m.group(0))
         except Exception:
             return None
     return None
 
 
+# ------------ Async Sheets wrappers ----------------
+# gspread calls are blocking HTTP; handlers run them in worker threads so one slow
+# Sheets request does not stall every other chat. SHEETS_SEM bounds concurrency
+# to stay inside the Sheets per-minute quota.
+SHEETS_MAX_CONCURRENCY = int(os.environ.get("SHEETS_MAX_CONCURRENCY", "8"))
+SHEETS_SEM = asyncio.Semaphore(SHEETS_MAX_CONCURRENCY)
+
+
+# user_id -> lock around balance read-modify-write; entries vanish once no task holds them
+_BALANCE_LOCKS: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def balance_lock(user_id: int) -> asyncio.Lock:
+    lock = _BALANCE_LOCKS.get(user_id)
+    if lock is None:
+        lock = _BALANCE_LOCKS[user_id] = asyncio.Lock()
+    return lock
+
+
+async def run_sheets_io(func, *args, **kwargs):
+    async with SHEETS_SEM:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+async def aget_config_data(force_refresh: bool = False) -> Dict[str, str]:
+    # Fresh cache hits stay on the event loop; only a refresh goes to a thread
+    if not force_refresh and time.time() - CONFIG_CACHE.ts <= CONFIG_TTL_SECONDS:
+        return CONFIG_CACHE.data
+    return await run_sheets_io(get_config_data, force_refresh)
+
+
+async def ais_multi_admin(user_id: int) -> bool:
+    await aget_config_data()
+    return is_multi_admin(user_id)
+
+
+_USERS_REFRESH_LOCK = asyncio.Lock()
+
+
+async def arefresh_users_cache_if_stale() -> None:
+    # One reload per expiry, however many handlers notice it at once
+    async with _USERS_REFRESH_LOCK:
+        if users_cache_stale():
+            await run_sheets_io(refresh_users_cache)
+
+
+async def aget_user_data(user_id: int) -> Dict[str, str]:
+    """User record for display and ban checks, served from USERS_CACHE.
+
+    Entries older than USER_DATA_TTL_SECONDS are re-read, so a ban set in the sheet
+    applies within seconds. Balance changes must still use aread_user_for_update.
+    """
+    if users_cache_stale():
+        await arefresh_users_cache_if_stale()
+    cached = get_cached_user(user_id)
+    if cached is not None and not user_entry_stale(user_id):
+        return cached
+    # Miss or expired entry: re-read the row (this also refreshes the cache);
+    # a failed read keeps serving the cached entry
+    located = await run_sheets_io(read_user_for_update, user_id)
+    if located is not None:
+        return located[1]
+    return cached if cached is not None else _default_user_data(user_id)
+
+
+async def aread_user_for_update(user_id: int) -> Optional[Tuple[int, Dict[str, str]]]:
+    return await run_sheets_io(read_user_for_update, user_id)
+
+
+async def ais_user_banned(user_id: int) -> bool:
+    return is_banned(await aget_user_data(user_id))
+
+
+async def aset_user_banned_status(user_id: int, banned: bool) -> bool:
+    return await run_sheets_io(set_user_banned_status, user_id, banned)
+
+
+async def aupdate_balance_and_log_order(user_id: int, row: int, new_balance: int, order: Dict) -> bool:
+    return await run_sheets_io(update_balance_and_log_order, user_id, row, new_balance, order)
+
+
+async def aadjust_user_balance(user_id: int, change: int) -> Optional[Tuple[int, int]]:
+    """Add `change` coins from a fresh read under the user's balance lock (admin Cash Control).
+
+    Returns (old_balance, new_balance); nothing is written when new_balance would be
+    negative. None if the row could not be read or written.
+    """
+    async with balance_lock(user_id):
+        located = await aread_user_for_update(user_id)
+        if located is None:
+            return None
+        row, user_data = located
+        old_balance = coin_balance_of(user_data)
+        new_balance = old_balance + change
+        if new_balance >= 0 and not await run_sheets_io(write_user_balance, user_id, row, new_balance):
+            return None
+        return old_balance, new_balance
+
+
+async def alog_order(order: Dict) -> bool:
+    # Handlers schedule this with application.create_task so the reply does not wait on the append
+    return await run_sheets_io(log_order, order)
+
+
+async def alog_admin_action(admin_id: int, admin_username: str, action: str,
+                            target_user: str = "", details: str = "") -> bool:
+    return await run_sheets_io(log_admin_action, admin_id, admin_username, action, target_user, details)
+
+
+# ------------ Maintenance reply ----------------
+MAINTENANCE_TEXT = "⏸️ Bot is currently closed for maintenance. Please try again later."
+
+
+async def reply_maintenance(update: Update) -> None:
+    """Tell the user the bot is closed; works for both messages and callback queries."""
+    await update.effective_message.reply_text(MAINTENANCE_TEXT)
+
+
+async def send_with_retry(coro_factory, attempts: int = 4, delay: float = 0.5):
+    """Await coro_factory(), retrying connection errors with exponential backoff.
+
+    Only errors raised before the request reached Telegram are retried. TimedOut
+    may mean the message was already delivered, so it is raised immediately, as
+    is BadRequest. RetryAfter is left to the application's AIORateLimiter.
+    """
+    for attempt in range(attempts):
+        try:
+            return await coro_factory()
+        except (BadRequest, TimedOut):
+            raise
+        except NetworkError:
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(delay)
+            delay *= 2
+
+
 # ------------ HANDLERS FOR ADMIN BUTTONS ------------
+@require_admin
 async def handle_admin_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle admin back button"""
-    user = update.effective_user
-    if not is_multi_admin(user.id):
-        await update.message.reply_text("You are not authorized.")
-        return
-    
     await update.message.reply_text(
         "🏠 Returning to admin menu...",
         reply_markup=ADMIN_REPLY_KEYBOARD
@@ -594,19 +1046,17 @@ async def handle_admin_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # =============== MAIN HANDLERS ===============
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    register_user_if_not_exists(user.id, user.full_name)
+    user_data = await run_sheets_io(start_bootstrap, user.id, user.full_name)
     
-    if is_user_banned(user.id):
+    if is_banned(user_data):
         await update.message.reply_text("❌ သင့်အကောင့်အား ပိတ်ထားထားသည်။ Support ထံ ဆက်သွယ်ပါ။")
         return
         
-    config = get_config_data()
-    is_admin = is_multi_admin(user.id)
+    config = await aget_config_data()
+    is_admin = await ais_multi_admin(user.id)
 
     if not is_admin and not get_bot_status():
-        await update.message.reply_text(
-            "⏸️ Bot is currently closed for maintenance. Please try again later."
-        )
+        await reply_maintenance(update)
         return
     
     welcome_text = (
@@ -621,14 +1071,14 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def show_product_inline_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    config = get_config_data()
-    is_admin = is_multi_admin(user.id)
+    config = await aget_config_data()
+    is_admin = await ais_multi_admin(user.id)
     
     if not is_admin and not get_bot_status():
-        await update.message.reply_text("⏸️ Bot is currently closed for maintenance.")
+        await reply_maintenance(update)
         return
     
-    if is_user_banned(user.id):
+    if await ais_user_banned(user.id):
         await update.message.reply_text("❌ သင့်အကောင့်အား ပိတ်ထားပါသည်။")
         return
 
@@ -638,18 +1088,19 @@ async def show_product_inline_menu(update: Update, context: ContextTypes.DEFAULT
 
 async def handle_user_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    config = get_config_data()
-    is_admin = is_multi_admin(user.id)
+    config = await aget_config_data()
+    is_admin = await ais_multi_admin(user.id)
     
     if not is_admin and not get_bot_status():
-        await update.message.reply_text("⏸️ Bot is currently closed for maintenance.")
+        await reply_maintenance(update)
         return
     
-    if is_user_banned(user.id):
+    # One (usually cached) read serves both the ban check and the info card
+    data = await aget_user_data(user.id)
+    if is_banned(data):
         await update.message.reply_text("❌ သင့်အကောင့်အား ပိတ်ထားပါသည်။")
         return
     
-    data = get_user_data_from_sheet(user.id)
     info_text = (
         f"👤 **User Information**\n\n"
         f"🔸 **Your ID:** `{data.get('user_id')}`\n"
@@ -660,27 +1111,27 @@ async def handle_user_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"🔸 **Total Purchase:** {data.get('total_purchase', '0')} MMK\n"
         f"🔸 **Banned:** {data.get('banned')}\n"
     )
-    back_keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("↩️ Back to Menu", callback_data="menu_back")]])
+    back_keyboard = BACK_TO_MENU_INLINE_KEYBOARD
     await update.message.reply_text(info_text, reply_markup=back_keyboard, parse_mode="Markdown")
 
 
 async def handle_help_center(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    config = get_config_data()
-    is_admin = is_multi_admin(user.id)
+    config = await aget_config_data()
+    is_admin = await ais_multi_admin(user.id)
     
     if not is_admin and not get_bot_status():
-        await update.message.reply_text("⏸️ Bot is currently closed for maintenance.")
+        await reply_maintenance(update)
         return
     
-    config = get_config_data()
+    config = await aget_config_data()
     admin_username = config.get("admin_contact_username", "@Admin")
     help_text = (
         "❓ **Help Center**\n\n"
         f"For assistance, contact the administrator:\nAdmin Contact: **{admin_username}**\n\n"
         "We will respond as soon as possible."
     )
-    back_keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("↩️ Back to Menu", callback_data="menu_back")]])
+    back_keyboard = BACK_TO_MENU_INLINE_KEYBOARD
     if update.callback_query:
         await update.callback_query.message.reply_text(help_text, reply_markup=back_keyboard, parse_mode="Markdown")
     else:
@@ -690,14 +1141,14 @@ async def handle_help_center(update: Update, context: ContextTypes.DEFAULT_TYPE)
 # ----------- Payment Flow -----------
 async def handle_payment_method(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    config = get_config_data()
-    is_admin = is_multi_admin(user.id)
+    config = await aget_config_data()
+    is_admin = await ais_multi_admin(user.id)
     
     if not is_admin and not get_bot_status():
-        await update.message.reply_text("⏸️ Bot is currently closed for maintenance.")
+        await reply_maintenance(update)
         return ConversationHandler.END
     
-    if is_user_banned(user.id):
+    if await ais_user_banned(user.id):
         await update.message.reply_text("❌ သင့်အကောင့်အား ပိတ်ထားပါသည်။")
         return ConversationHandler.END
     
@@ -722,7 +1173,7 @@ async def handle_coin_package_select(update: Update, context: ContextTypes.DEFAU
     context.user_data["selected_coinpkg"] = {"coins": coins, "mmk": mmk}
     await query.message.edit_text(
         f"💳 You selected **{coins} Coins — {mmk} MMK**.\nPlease choose payment method:",
-        reply_markup=get_payment_keyboard(),
+        reply_markup=PAYMENT_KEYBOARD,
         parse_mode="Markdown",
     )
     return CHOOSING_PAYMENT_METHOD
@@ -738,7 +1189,7 @@ async def start_payment_conv(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return ConversationHandler.END
     
     payment_method = parts[1]
-    config = get_config_data()
+    config = await aget_config_data()
     admin_name = config.get(f"{payment_method}_name", "Admin Name")
     phone_number = config.get(f"{payment_method}_phone", "09XXXXXXXXX")
     
@@ -747,7 +1198,7 @@ async def start_payment_conv(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if pkg:
         pkg_text = f"\nPackage: {pkg['coins']} Coins — {pkg['mmk']} MMK\n"
     
-    back_keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("↩️ Back to Payment Menu", callback_data="payment_back")]])
+    back_keyboard = BACK_TO_PAYMENT_INLINE_KEYBOARD
     transfer_text = (
         f"✅ Please transfer via **{payment_method.upper()}** as follows:{pkg_text}\n"
         f"Name: **{admin_name}**\n"
@@ -761,20 +1212,47 @@ async def start_payment_conv(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def back_to_payment_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
+    await aget_config_data()  # refresh off the loop so the keyboard builder only reads the cache
     await query.message.edit_text("💰 Select Coin Package:", reply_markup=get_coin_package_keyboard())
     return SELECT_COIN_PACKAGE
 
 
+# Approve-button amounts, parsed once per config snapshot: (CONFIG_CACHE.ts, choices)
+_APPROVE_CHOICES_CACHE: Tuple[float, List[int]] = (-1.0, [])
+DEFAULT_APPROVE_CHOICES = [19000, 20000, 50000, 100000]
+
+
+def get_receipt_approve_choices(config: Dict) -> List[int]:
+    """Approve amounts from config (descending), re-parsed only when the config cache refreshes."""
+    global _APPROVE_CHOICES_CACHE
+    if _APPROVE_CHOICES_CACHE[0] == CONFIG_CACHE.ts:
+        return _APPROVE_CHOICES_CACHE[1]
+
+    amounts_cfg = config.get("receipt_approve_amounts", "")
+    if amounts_cfg:
+        try:
+            clean_amounts_cfg = "".join(c for c in amounts_cfg if c.isdigit() or c == ',')
+            choices = [int(x.strip()) for x in clean_amounts_cfg.split(",") if x.strip() and x.strip().isdigit()]
+        except Exception:
+            choices = DEFAULT_APPROVE_CHOICES
+    else:
+        choices = DEFAULT_APPROVE_CHOICES
+
+    choices = sorted(set(choices), reverse=True)
+    _APPROVE_CHOICES_CACHE = (CONFIG_CACHE.ts, choices)
+    return choices
+
+
 async def receive_receipt(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    if is_user_banned(user.id):
+    if await ais_user_banned(user.id):
         await update.message.reply_text("❌ သင့်အကောင့်အား ပိတ်ထားပါသည်။")
         return ConversationHandler.END
 
-    config = get_config_data()
+    config = await aget_config_data()
     admin_contact_id = get_dynamic_admin_id(config)
     
-    timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = utcnow_str()
     short_ts = int(time.time())
     
     receipt_meta = {
@@ -797,22 +1275,9 @@ async def receive_receipt(update: Update, context: ContextTypes.DEFAULT_TYPE):
             forwarded_text = f"📥 Receipt (text) from @{user.username or user.full_name} (id:{user.id})\nTime: {timestamp}\n\n{text}"
             await context.bot.send_message(chat_id=admin_contact_id, text=forwarded_text)
 
-        amounts_cfg = config.get("receipt_approve_amounts", "")
-        default_choices = [19000, 20000, 50000, 100000]
-
-        if amounts_cfg:
-            try:
-                clean_amounts_cfg = "".join(c for c in amounts_cfg if c.isdigit() or c == ',')
-                choices = [int(x.strip()) for x in clean_amounts_cfg.split(",") if x.strip() and x.strip().isdigit()]
-            except Exception:
-                choices = default_choices
-        else:
-            choices = default_choices
-
+        choices = get_receipt_approve_choices(config)
         if detected_amount and detected_amount not in choices:
-            choices = [detected_amount] + choices
-
-        choices = sorted(list(set(choices)), reverse=True)
+            choices = sorted(choices + [detected_amount], reverse=True)
 
         kb_rows = []
         row = []
@@ -839,16 +1304,50 @@ async def receive_receipt(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+# Receipt approval messages, filled with str.format_map
+APPROVED_ADMIN_TMPL = (
+    "✅ **APPROVED: {amount:,.0f} MMK**\n\n"
+    "💰 **Added {coins:,.0f} Coins** to user.\n\n"
+    "♦️User: 🧸**{user_name}** (id:`{user_id}`)\n"
+    "👾Processed by: **{processed_by}**\n"
+    "👾Order ID: `{order_id}`\n"
+    "👾Time: `{ts} UTC`"
+)
+APPROVED_USER_TMPL = "🎉Your balance {coins:,.0f} coin top up Successful. New balance: {balance:,.0f} Coins."
+
+# Receipts already decided, keyed "chat_id|message_id" of the admin's receipt message,
+# oldest first. One approve or deny per receipt: a double tap, a redelivered callback
+# or a second approve amount is ignored.
+PROCESSED_RECEIPTS_MAX = 10000
+_PROCESSED_RECEIPTS: "collections.OrderedDict[str, None]" = collections.OrderedDict()
+
+
+def claim_receipt(key: str) -> bool:
+    """Mark a receipt as being processed; False if it was already claimed."""
+    if key in _PROCESSED_RECEIPTS:
+        return False
+    _PROCESSED_RECEIPTS[key] = None
+    if len(_PROCESSED_RECEIPTS) > PROCESSED_RECEIPTS_MAX:
+        _PROCESSED_RECEIPTS.popitem(last=False)
+    return True
+
+
+def release_receipt(key: str) -> None:
+    """Forget a claimed receipt so a failed approval can be retried."""
+    _PROCESSED_RECEIPTS.pop(key, None)
+
+
+@require_admin
 async def admin_approve_receipt_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    data = query.data
-    parts = data.split("|")
-    if len(parts) < 4:
+    try:
+        # rpa|<user_id>|<short_ts>|<amount>
+        _, user_id_str, short_ts_str, amount_str = query.data.split("|", 3)
+    except ValueError:
         await query.message.reply_text("Invalid admin action.")
         return
 
-    _, user_id_str, short_ts_str, amount_str = parts[0], parts[1], parts[2], parts[3]
     try:
         user_id = int(user_id_str)
         approved_amount = int(amount_str)
@@ -858,49 +1357,68 @@ async def admin_approve_receipt_callback(update: Update, context: ContextTypes.D
         await query.message.reply_text("Invalid parameters.")
         return
 
-    config = get_config_data()
-    
-    if not is_multi_admin(query.from_user.id):
-        await query.message.reply_text("You are not authorized to perform this action.")
+    # Claimed before the first await on Sheets so concurrent duplicates are caught too
+    receipt_key = f"{query.message.chat_id}|{query.message.message_id}"
+    if not claim_receipt(receipt_key):
+        await query.message.reply_text("ℹ️ This receipt has already been processed.")
         return
-    
+
+    # The button press is already answered; Sheets I/O and messages run in the background
+    context.application.create_task(
+        _process_receipt_approval(update, context, user_id, approved_amount, ts_human_readable, receipt_key),
+        update=update,
+    )
+
+
+async def _process_receipt_approval(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int,
+                                    approved_amount: int, ts_human_readable: str, receipt_key: str):
+    """Credit coins, log the order and notify both sides for an approved receipt."""
+    query = update.callback_query
+    config = await aget_config_data()
+
     try:
         ratio = float(config.get("mmk_to_coins_ratio", "0.5"))
     except Exception:
         ratio = 0.5
     coins_to_add = int(approved_amount * ratio)
 
-    user_data = get_user_data_from_sheet(user_id)
-    target_user_name = user_data.get("username", user_id)
+    # Read-modify-write of the balance; serialized per user with purchases and other approvals
+    async with balance_lock(user_id):
+        # Fresh from the sheet so a manual balance edit is not overwritten by a cached value
+        located = await aread_user_for_update(user_id)
+        if located is None:
+            release_receipt(receipt_key)
+            await query.message.edit_text("Failed to read user balance from sheet.")
+            return
+        user_row, user_data = located
+        target_user_name = user_data.get("username", user_id)
     
-    try:
-        current_coins = int(user_data.get("coin_balance", "0"))
-    except ValueError:
-        current_coins = 0
-    new_balance = current_coins + coins_to_add
-
-    ok = update_user_balance(user_id, new_balance)
-    if not ok:
-        await query.message.edit_text("Failed to update user balance in sheet.")
-        return
+        current_coins = coin_balance_of(user_data)
+        new_balance = current_coins + coins_to_add
 
-    order = {
-        "order_id": str(uuid.uuid4()),
-        "user_id": user_id,
-        "username": user_data.get("username", ""),
-        "product_key": "COIN_TOPUP",
-        "price_mmk": approved_amount,
-        "phone": "",
-        "premium_username": "",
-        "status": "APPROVED_RECEIPT",
-        "timestamp": datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-        "notes": f"Receipt approved by admin {query.from_user.id} at {ts_human_readable}",
-        "processed_by": str(query.from_user.id),
-    }
-    log_order(order)
+        # One timestamp for both the order row and the admin message
+        now_str = utcnow_str()
+        order = {
+            "order_id": secrets.token_hex(6),
+            "user_id": user_id,
+            "username": user_data.get("username", ""),
+            "product_key": "COIN_TOPUP",
+            "price_mmk": approved_amount,
+            "phone": "",
+            "premium_username": "",
+            "status": "APPROVED_RECEIPT",
+            "timestamp": now_str,
+            "notes": f"Receipt approved by admin {query.from_user.id} at {ts_human_readable}",
+            "processed_by": str(query.from_user.id),
+        }
+        ok = await aupdate_balance_and_log_order(user_id, user_row, new_balance, order)
+        if not ok:
+            release_receipt(receipt_key)
+            await query.message.edit_text("Failed to update user balance in sheet.")
+            return
     
     # Log admin action
-    log_admin_action(
+    await alog_admin_action(
         admin_id=query.from_user.id,
         admin_username=query.from_user.username or str(query.from_user.id),
         action="APPROVE_RECEIPT",
@@ -910,36 +1428,38 @@ async def admin_approve_receipt_callback(update: Update, context: ContextTypes.D
     
     processed_by_username = f"@{query.from_user.username}" if query.from_user.username else f"(id:{query.from_user.id})"
     
-    beautiful_message = (
-        f"✅ **APPROVED: {approved_amount:,.0f} MMK**\n\n"
-        f"💰 **Added {coins_to_add:,.0f} Coins** to user.\n\n"
-        f"♦️User: 🧸**{target_user_name}** (id:`{user_id}`)\n"
-        f"👾Processed by: **{processed_by_username}**\n"
-        f"👾Order ID: `{order['order_id']}`\n"
-        f"👾Time: `{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}`"
-    )
+    beautiful_message = APPROVED_ADMIN_TMPL.format_map({
+        "amount": approved_amount,
+        "coins": coins_to_add,
+        "user_name": target_user_name,
+        "user_id": user_id,
+        "processed_by": processed_by_username,
+        "order_id": order["order_id"],
+        "ts": now_str,
+    })
 
     try:
-        await context.bot.send_message(
+        await send_with_retry(lambda: context.bot.send_message(
             chat_id=user_id,
-            text=f"🎉Your balance {coins_to_add:,.0f} coin top up Successful. New balance: {new_balance:,.0f} Coins.",
-        )
+            text=APPROVED_USER_TMPL.format_map({"coins": coins_to_add, "balance": new_balance}),
+        ))
         await query.message.edit_text(beautiful_message, parse_mode="Markdown")
     except Exception as e:
         logger.error("Failed to notify user after approval: %s", e)
         await query.message.edit_text(f"Approved but failed to notify user. {beautiful_message}", parse_mode="Markdown")
 
 
+@require_admin
 async def admin_deny_receipt_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    data = query.data
-    parts = data.split("|")
-    if len(parts) < 3:
+    try:
+        # rpd|<user_id>|<short_ts>
+        _, user_id_str, short_ts_str = query.data.split("|", 2)
+    except ValueError:
         await query.message.reply_text("Invalid admin action.")
         return
     
-    _, user_id_str, short_ts_str = parts
     try:
         user_id = int(user_id_str)
         unix_to_dt = datetime.datetime.fromtimestamp(int(short_ts_str))
@@ -948,29 +1468,33 @@ async def admin_deny_receipt_callback(update: Update, context: ContextTypes.DEFA
         await query.message.reply_text("Invalid user id or timestamp.")
         return
 
-    config = get_config_data()
-
-    if not is_multi_admin(query.from_user.id):
-        await query.message.reply_text("You are not authorized to perform this action.")
+    if not claim_receipt(f"{query.message.chat_id}|{query.message.message_id}"):
+        await query.message.reply_text("ℹ️ This receipt has already been processed.")
         return
 
+    config = await aget_config_data()
+
+    # One Sheets read, reused for the order row and the admin message
+    user_data = await aget_user_data(user_id)
+    target_user_name = user_data.get("username", f"id:{user_id}")
+
     order = {
-        "order_id": str(uuid.uuid4()),
+        "order_id": secrets.token_hex(6),
         "user_id": user_id,
-        "username": get_user_data_from_sheet(user_id).get("username", ""),
+        "username": user_data.get("username", ""),
         "product_key": "COIN_TOPUP",
         "price_mmk": 0,
         "phone": "",
         "premium_username": "",
         "status": "DENIED_RECEIPT",
-        "timestamp": datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": utcnow_str(),
         "notes": f"Receipt denied by admin {query.from_user.id} at {ts_human_readable}",
         "processed_by": str(query.from_user.id),
     }
-    log_order(order)
+    context.application.create_task(alog_order(order), update=update)
     
     # Log admin action
-    log_admin_action(
+    await alog_admin_action(
         admin_id=query.from_user.id,
         admin_username=query.from_user.username or str(query.from_user.id),
         action="DENY_RECEIPT",
@@ -979,14 +1503,14 @@ async def admin_deny_receipt_callback(update: Update, context: ContextTypes.DEFA
     )
 
     try:
-        await context.bot.send_message(
+        await send_with_retry(lambda: context.bot.send_message(
             chat_id=user_id,
             text="❌ Admin has denied your payment/receipt. Please contact support or retry the payment.",
-        )
-        await query.message.edit_text("❌ Denied and user notified.")
+        ))
+        await query.message.edit_text(f"❌ Denied and user {target_user_name} (id:{user_id}) notified.")
     except Exception as e:
         logger.error("Failed to notify user after denial: %s", e)
-        await query.message.edit_text("Denied but failed to notify user.")
+        await query.message.edit_text(f"Denied but failed to notify user {target_user_name} (id:{user_id}).")
 
 
 # ----------- Product purchase flow -----------
@@ -995,11 +1519,11 @@ async def start_product_purchase(update: Update, context: ContextTypes.DEFAULT_T
     await query.answer()
     
     user = query.from_user
-    config = get_config_data()
-    is_admin = is_multi_admin(user.id)
+    config = await aget_config_data()
+    is_admin = await ais_multi_admin(user.id)
     
     if not is_admin and not get_bot_status():
-        await query.message.reply_text("⏸️ Bot is currently closed for maintenance.")
+        await reply_maintenance(update)
         return ConversationHandler.END
     
     parts = query.data.split("_")
@@ -1045,9 +1569,10 @@ async def select_product_price(update: Update, context: ContextTypes.DEFAULT_TYP
             parse_mode="Markdown",
         )
         
+    # edit_text only accepts inline markup, so the reply keyboard needs its own message here
     await context.bot.send_message(
         chat_id=query.from_user.id,
-        text="If you want to stop the order, click '🚫 Cancel Order'.",
+        text=CANCEL_HINT,
         reply_markup=CANCEL_KEYBOARD
     )
     return WAITING_FOR_PHONE
@@ -1055,24 +1580,17 @@ async def select_product_price(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def validate_phone_and_ask_username(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = (update.message.text or "").strip()
-    if PHONE_RE.match(text):
+    if PHONE_RE.fullmatch(text):
         context.user_data["premium_phone"] = text
         await update.message.reply_text(
-            f"Thank you. Now please send the **Telegram Username** associated with {text} (start with @ or plain username)."
-        )
-        await context.bot.send_message(
-            chat_id=update.effective_user.id,
-            text="If you want to stop the order, click '🚫 Cancel Order'.",
+            f"Thank you. Now please send the **Telegram Username** associated with {text} (start with @ or plain username).\n"
+            f"{CANCEL_HINT}",
             reply_markup=CANCEL_KEYBOARD
         )
         return WAITING_FOR_USERNAME
     else:
+        # The cancel keyboard from the previous prompt is still shown
         await update.message.reply_text("❌ Invalid phone. Send digits only (8-15 digits).")
-        await context.bot.send_message(
-            chat_id=update.effective_user.id,
-            text="If you want to stop the order, click '🚫 Cancel Order'.",
-            reply_markup=CANCEL_KEYBOARD
-        )
         return WAITING_FOR_PHONE
 
 
@@ -1080,7 +1598,7 @@ async def finalize_product_order(update: Update, context: ContextTypes.DEFAULT_T
     user = update.effective_user
     user_id = user.id
 
-    if is_user_banned(user_id):
+    if await ais_user_banned(user_id):
         await update.message.reply_text("❌ သင့်အကောင့်အား ပိတ်ထားပါသည်။", reply_markup=MAIN_MENU_KEYBOARD)
         return ConversationHandler.END
 
@@ -1090,10 +1608,8 @@ async def finalize_product_order(update: Update, context: ContextTypes.DEFAULT_T
     premium_username = normalize_username(raw_username)
 
     if not premium_username:
-        await update.message.reply_text("❌ Invalid username format. Please try again.")
-        await context.bot.send_message(
-            chat_id=update.effective_user.id,
-            text="If you want to stop the order, click '🚫 Cancel Order'.",
+        await update.message.reply_text(
+            f"❌ Invalid username format. Please try again.\n{CANCEL_HINT}",
             reply_markup=CANCEL_KEYBOARD
         )
         return WAITING_FOR_USERNAME
@@ -1102,76 +1618,65 @@ async def finalize_product_order(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text("❌ No product selected. Please start again.", reply_markup=MAIN_MENU_KEYBOARD)
         return ConversationHandler.END
 
-    config = get_config_data()
-    price_mmk_str = config.get(product_key)
-    if price_mmk_str is None:
-        await update.message.reply_text("❌ Price for this product not found in config.", reply_markup=MAIN_MENU_KEYBOARD)
-        return ConversationHandler.END
-
-    try:
-        price_mmk_needed = int(price_mmk_str)
-    except ValueError:
-        await update.message.reply_text("❌ Product MMK price in config is invalid.", reply_markup=MAIN_MENU_KEYBOARD)
+    config = await aget_config_data()
+    # Prices are parsed once per config refresh into CONFIG_CACHE.products
+    product = CONFIG_CACHE.products.get(product_key)
+    if product is None:
+        if config.get(product_key) is None:
+            await update.message.reply_text("❌ Price for this product not found in config.", reply_markup=MAIN_MENU_KEYBOARD)
+        else:
+            await update.message.reply_text("❌ Product MMK price in config is invalid.", reply_markup=MAIN_MENU_KEYBOARD)
         return ConversationHandler.END
 
-    product_type = product_key.split('_')[0]
-    coin_rate_key = f"coin_rate_{product_type}"
-    try:
-        coin_rate_mmk = float(config.get(coin_rate_key, "1000")) 
-    except ValueError:
-        coin_rate_mmk = 1000.0
-
-    if coin_rate_mmk <= 0:
-         coin_rate_mmk = 1000.0
-         
-    price_needed_coins = int(price_mmk_needed / coin_rate_mmk) 
-    price_needed_coins = max(1, price_needed_coins)
-
-    user_data = get_user_data_from_sheet(user_id)
-    try:
-        user_coins = int(user_data.get("coin_balance", "0"))
-    except ValueError:
-        user_coins = 0
-
-    if user_coins < price_needed_coins:
-        await update.message.reply_text(
-            f"❌ Insufficient coin balance. You need {price_needed_coins:,.0f} Coins but have {user_coins:,.0f} Coins. Use '💰 Payment Method' to top up.",
-            reply_markup=MAIN_MENU_KEYBOARD
-        )
+    price_mmk_needed = product["mmk"]
+    price_needed_coins = product["coins"]
+
+    # Same per-user lock as receipt approval so the balance read and write are not interleaved
+    async with balance_lock(user_id):
+        # Fresh from the sheet so a manual balance edit is not overwritten by a cached value
+        located = await aread_user_for_update(user_id)
+        if located is None:
+            await update.message.reply_text("❌ Could not read your balance. Please try again later.", reply_markup=MAIN_MENU_KEYBOARD)
+            return ConversationHandler.END
+        user_row, user_data = located
+        user_coins = coin_balance_of(user_data)
+
+        if user_coins < price_needed_coins:
+            await update.message.reply_text(
+                f"❌ Insufficient coin balance. You need {price_needed_coins:,.0f} Coins but have {user_coins:,.0f} Coins. Use '💰 Payment Method' to top up.",
+                reply_markup=MAIN_MENU_KEYBOARD
+            )
+            order = {
+                "order_id": secrets.token_hex(6),
+                "user_id": user_id,
+                "username": user_data.get("username", ""),
+                "product_key": product_key,
+                "price_mmk": price_mmk_needed,
+                "phone": premium_phone,
+                "premium_username": premium_username,
+                "status": "FAILED_INSUFFICIENT_FUNDS",
+                "notes": "User attempted purchase without sufficient coins.",
+            }
+            context.application.create_task(alog_order(order), update=update)
+            return ConversationHandler.END
+
+        new_balance = user_coins - price_needed_coins
         order = {
-            "order_id": str(uuid.uuid4()),
+            "order_id": secrets.token_hex(6),
             "user_id": user_id,
             "username": user_data.get("username", ""),
             "product_key": product_key,
             "price_mmk": price_mmk_needed,
             "phone": premium_phone,
             "premium_username": premium_username,
-            "status": "FAILED_INSUFFICIENT_FUNDS",
-            "notes": "User attempted purchase without sufficient coins.",
+            "status": "ORDER_PLACED",
+            "notes": f"Order placed and {price_needed_coins:,.0f} Coins deducted.",
         }
-        log_order(order)
-        return ConversationHandler.END
-
-    new_balance = user_coins - price_needed_coins
-    ok = update_user_balance(user_id, new_balance)
-    if not ok:
-        await update.message.reply_text("❌ Failed to deduct coins. Please contact admin.", reply_markup=MAIN_MENU_KEYBOARD)
-        return ConversationHandler.END
-
-    order = {
-        "order_id": str(uuid.uuid4()),
-        "user_id": user_id,
-        "username": user_data.get("username", ""),
-        "product_key": product_key,
-        "price_mmk": price_mmk_needed,
-        "phone": premium_phone,
-        "premium_username": premium_username,
-        "status": "ORDER_PLACED",
-        "notes": f"Order placed and {price_needed_coins:,.0f} Coins deducted.",
-    }
-    log_order(order)
+        ok = await aupdate_balance_and_log_order(user_id, user_row, new_balance, order)
+        if not ok:
+            await update.message.reply_text("❌ Failed to deduct coins. Please contact admin.", reply_markup=MAIN_MENU_KEYBOARD)
+            return ConversationHandler.END
     
-    config = get_config_data()
     admin_id_check = get_dynamic_admin_id(config)
 
     await update.message.reply_text(
@@ -1210,7 +1715,7 @@ async def back_to_service_menu(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.answer()
     
     user = query.from_user
-    is_admin = is_multi_admin(user.id)
+    is_admin = await ais_multi_admin(user.id)
     keyboard_to_use = ADMIN_REPLY_KEYBOARD if is_admin else MAIN_MENU_KEYBOARD
 
     welcome_text = "Welcome back to the main menu. Choose from the options below."
@@ -1229,11 +1734,8 @@ async def back_to_service_menu(update: Update, context: ContextTypes.DEFAULT_TYP
 
 
 # Admin commands
+@require_admin
 async def admin_ban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not is_multi_admin(update.effective_user.id):
-        await update.message.reply_text("You are not authorized.")
-        return
-    
     args = context.args
     if not args:
         await update.message.reply_text("Usage: /ban <user_id>")
@@ -1245,10 +1747,10 @@ async def admin_ban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Invalid user id.")
         return
     
-    ok = set_user_banned_status(target, True)
+    ok = await aset_user_banned_status(target, True)
     if ok:
         # Log admin action
-        log_admin_action(
+        await alog_admin_action(
             admin_id=update.effective_user.id,
             admin_username=update.effective_user.username or str(update.effective_user.id),
             action="BAN_USER",
@@ -1260,11 +1762,8 @@ async def admin_ban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Failed to ban user.")
 
 
+@require_admin
 async def admin_unban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not is_multi_admin(update.effective_user.id):
-        await update.message.reply_text("You are not authorized.")
-        return
-    
     args = context.args
     if not args:
         await update.message.reply_text("Usage: /unban <user_id>")
@@ -1276,10 +1775,10 @@ async def admin_unban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Invalid user id.")
         return
     
-    ok = set_user_banned_status(target, False)
+    ok = await aset_user_banned_status(target, False)
     if ok:
         # Log admin action
-        log_admin_action(
+        await alog_admin_action(
             admin_id=update.effective_user.id,
             admin_username=update.effective_user.username or str(update.effective_user.id),
             action="UNBAN_USER",
@@ -1291,6 +1790,46 @@ async def admin_unban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Failed to unban user.")
 
 
+# ----------- Reply keyboard routing -----------
+# Button label -> handler; one MessageHandler looks the label up instead of
+# trying a separate filters.Text handler per button
+ROUTES = {
+    BTN_USER_INFO: handle_user_info,
+    BTN_HELP: handle_help_center,
+    BTN_PREMIUM: show_product_inline_menu,
+    BTN_ADMIN_BACK: handle_admin_back,
+}
+# filters.Text tests `text in strings`; a frozenset keeps that a hash lookup
+ROUTE_LABELS = frozenset(ROUTES)
+
+
+async def route_reply_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    handler = ROUTES.get(update.message.text)
+    if handler is not None:
+        return await handler(update, context)
+
+
+# Inline button callback data -> handler. Receipt actions are keyed by the part
+# before the first "|", the rest by exact value or prefix.
+CB_ROUTES = {
+    "rpa": admin_approve_receipt_callback,
+    "rpd": admin_deny_receipt_callback,
+    "menu_back": back_to_service_menu,
+}
+CB_PREFIX_ROUTES = (
+    ("product_", start_product_purchase),
+)
+
+
+async def route_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    data = update.callback_query.data or ""
+    handler = CB_ROUTES.get(data.split("|", 1)[0])
+    if handler is None:
+        handler = next((fn for prefix, fn in CB_PREFIX_ROUTES if data.startswith(prefix)), None)
+    if handler is not None:
+        return await handler(update, context)
+
+
 # Error handler
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     err_type = type(context.error).__name__ if context.error else "UnknownError"
@@ -1298,22 +1837,8 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
     logger.error("Exception while handling an update: %s: %s", err_type, err_msg)
     
     # Send to all admins
-    config = get_config_data()
-    admin_ids_str = config.get("multi_admin_ids", "")
-    admin_ids = []
-    
-    if admin_ids_str:
-        try:
-            admin_ids = [int(x.strip()) for x in admin_ids_str.split(",") if x.strip()]
-        except:
-            pass
-    
-    # Add main admin
-    main_admin = get_dynamic_admin_id(config)
-    if main_admin not in admin_ids:
-        admin_ids.append(main_admin)
-    
-    for admin_id in admin_ids:
+    await aget_config_data()
+    for admin_id in CONFIG_CACHE.admin_ids:
         try:
             await context.bot.send_message(
                 chat_id=admin_id,
@@ -1324,23 +1849,71 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
 
 
 # --------------- Main ---------------
-def main():
-    ok = initialize_sheets()
+async def post_init(application: Application) -> None:
+    """Connect to Google Sheets once the event loop is running."""
+    ok = await initialize_sheets()
     if not ok:
-        logger.error("Bot cannot start due to Google Sheets initialization failure.")
-        return
+        raise RuntimeError("Bot cannot start due to Google Sheets initialization failure.")
 
-    if not BOT_TOKEN:
-        logger.error("Missing BOT_TOKEN environment variable.")
-        return
+    # Worksheets only exist after initialization, hand them to the admin commands now
+    admin_commands = application.bot_data.get("admin_commands")
+    if admin_commands:
+        admin_commands.ws_user_data = WS_USER_DATA
+        admin_commands.ws_config = WS_CONFIG
+        admin_commands.ws_orders = WS_ORDERS
+        admin_commands.ws_admin_logs = WS_ADMIN_LOGS
 
     # Set bot to active by default on startup
     set_bot_status(True)
     logger.info("✅ Bot started in ACTIVE mode by default")
 
-    application = Application.builder().token(BOT_TOKEN).build()
 
-    # Initialize AdminCommands
+def main():
+    if not BOT_TOKEN:
+        logger.error("Missing BOT_TOKEN environment variable.")
+        return
+    use_webhook = bool(WEBHOOK_URL) and not DEV_MODE
+    if use_webhook and not WEBHOOK_URL.startswith("https://"):
+        logger.error("Webhook URL must start with https:// (got %r).", WEBHOOK_URL)
+        return
+    try:
+        port = int(PORT)
+    except ValueError:
+        port = 0
+    if not 1 <= port <= 65535:
+        logger.error("PORT must be between 1 and 65535 (got %r).", PORT)
+        return
+
+    # Optional faster event loop; run_webhook/run_polling pick it up via the loop policy
+    try:
+        import uvloop
+        uvloop.install()
+        logger.info("Using uvloop event loop.")
+    except ImportError:
+        pass
+
+    # Large HTTP/2 pool so bursts of sends share a few kept-alive TLS connections
+    request = HTTPXRequest(
+        connection_pool_size=256,
+        http_version="2",
+        pool_timeout=10.0,
+        connect_timeout=5.0,
+        read_timeout=20.0,
+    )
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .request(request)
+        .get_updates_request(HTTPXRequest(connection_pool_size=8, http_version="2"))
+        # No concurrent_updates: the ConversationHandlers need updates processed one at a time.
+        # The button/callback routers use block=False so their I/O doesn't hold up the queue.
+        # Keep outgoing calls under Telegram's ~30 msg/s global limit instead of hitting 429s
+        .rate_limiter(AIORateLimiter(overall_max_rate=28, overall_time_period=1, max_retries=3))
+        .post_init(post_init)
+        .build()
+    )
+
+    # Initialize AdminCommands (worksheets are attached in post_init)
     admin_commands = AdminCommands(
         ws_user_data=WS_USER_DATA,
         ws_config=WS_CONFIG,
@@ -1350,26 +1923,36 @@ def main():
         get_dynamic_admin_id=get_dynamic_admin_id,
         is_multi_admin=is_multi_admin,
         log_admin_action=log_admin_action,
-        get_all_users=get_all_users,
+        get_all_users=get_cached_users,
         get_pending_orders=get_pending_orders,
         update_order_status=update_order_status,
         update_config_value=update_config_value,
         set_bot_status=set_bot_status,
-        get_bot_status=get_bot_status
+        get_bot_status=get_bot_status,
+        run_sheets_io=run_sheets_io,
+        update_cached_user=update_cached_user,
+        ais_multi_admin=ais_multi_admin,
+        adjust_user_balance=aadjust_user_balance,
     )
+    application.bot_data["admin_commands"] = admin_commands
+
+    # All handlers live in group 0 and are tried in registration order:
+    # commands, admin flows, user conversations, then the button/callback routers.
 
     # Command handlers
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("cancel", cancel_product_order))
-    application.add_handler(CommandHandler("ban", admin_ban_user))
-    application.add_handler(CommandHandler("unban", admin_unban_user))
+    application.add_handlers([
+        CommandHandler("start", start_command),
+        CommandHandler("cancel", cancel_product_order),
+        CommandHandler("ban", admin_ban_user),
+        CommandHandler("unban", admin_unban_user),
+    ])
 
     # Add admin command handlers from AdminCommands
     admin_commands.register_handlers(application)
 
     # Payment Conversation Handler
     payment_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Text("💰 Payment Method"), handle_payment_method)],
+        entry_points=[MessageHandler(filters.Text([BTN_PAYMENT]), handle_payment_method)],
         states={
             SELECT_COIN_PACKAGE: [
                 CallbackQueryHandler(handle_coin_package_select, pattern=r"^buycoin_")
@@ -1386,7 +1969,6 @@ def main():
         fallbacks=[CallbackQueryHandler(back_to_service_menu, pattern=r"^menu_back$")],
         allow_reentry=True,
     )
-    application.add_handler(payment_conv_handler)
 
     # Product Conversation Handler
     product_purchase_handler = ConversationHandler(
@@ -1397,56 +1979,58 @@ def main():
                 CallbackQueryHandler(back_to_service_menu, pattern=r"^menu_back$"),
             ],
             WAITING_FOR_PHONE: [
-                MessageHandler(filters.Text("🚫 Cancel Order"), cancel_product_order),
+                MessageHandler(filters.Text(["🚫 Cancel Order"]), cancel_product_order),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, validate_phone_and_ask_username)
             ],
             WAITING_FOR_USERNAME: [
-                MessageHandler(filters.Text("🚫 Cancel Order"), cancel_product_order),
+                MessageHandler(filters.Text(["🚫 Cancel Order"]), cancel_product_order),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, finalize_product_order)
             ],
         },
         fallbacks=[
             CallbackQueryHandler(back_to_service_menu, pattern=r"^menu_back$"),
-            MessageHandler(filters.Text("🚫 Cancel Order"), cancel_product_order) 
+            MessageHandler(filters.Text(["🚫 Cancel Order"]), cancel_product_order) 
         ],
         allow_reentry=True,
     )
-    application.add_handler(product_purchase_handler)
 
-    # Message handlers for reply keyboard
-    application.add_handler(MessageHandler(filters.Text("👤 User Info"), handle_user_info))
-    application.add_handler(MessageHandler(filters.Text("❓ Help Center"), handle_help_center))
-    application.add_handler(MessageHandler(filters.Text("✨ Premium & Star"), show_product_inline_menu))
-    
-    # Admin buttons handlers
-    application.add_handler(MessageHandler(filters.Text("🏠 Back to Admin Menu"), handle_admin_back))
-    
-    # Inline callbacks
-    application.add_handler(CallbackQueryHandler(start_product_purchase, pattern=r"^product_"))
-    
-    # Admin callback handlers for approve/deny
-    application.add_handler(CallbackQueryHandler(admin_approve_receipt_callback, pattern=r"^rpa\|"))
-    application.add_handler(CallbackQueryHandler(admin_deny_receipt_callback, pattern=r"^rpd\|"))
-
-    # Back/menu callback
-    application.add_handler(CallbackQueryHandler(back_to_service_menu, pattern=r"^menu_back$"))
+    application.add_handlers([
+        payment_conv_handler,
+        product_purchase_handler,
+        # Reply keyboard buttons (user and admin). Kept in group 0 after the conversations:
+        # a handler in a later group would also run for text a conversation already consumed.
+        MessageHandler(filters.Text(ROUTE_LABELS), route_reply_button, block=False),
+        # Inline callbacks outside the conversations (receipt approve/deny, products, menu back)
+        CallbackQueryHandler(route_callback_query, block=False),
+    ])
 
     # Global error handler
     application.add_error_handler(error_handler)
 
     # Run webhook or polling
     token = BOT_TOKEN
-    if RENDER_EXTERNAL_URL:
+    if use_webhook:
         listen = "0.0.0.0"
-        port = PORT
         url_path = token
-        webhook_url = f"{RENDER_EXTERNAL_URL}/{token}"
-        print(f"Starting webhook on port {port}, URL: {webhook_url}")
-        logger.info("Setting webhook URL to: %s", webhook_url)
-        application.run_webhook(listen=listen, port=port, url_path=url_path, webhook_url=webhook_url)
+        webhook_url = f"{WEBHOOK_URL.rstrip('/')}/{token}"
+        # The path is the bot token, so only the base URL goes to the logs
+        logger.info("Starting webhook on port %s, URL: %s/<token>", port, WEBHOOK_URL.rstrip('/'))
+        application.run_webhook(
+            listen=listen,
+            port=port,
+            url_path=url_path,
+            webhook_url=webhook_url,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=100,
+            allowed_updates=ALLOWED_UPDATES,
+            drop_pending_updates=DROP_PENDING_UPDATES,
+        )
     else:
-        logger.info("RENDER_EXTERNAL_URL not set — using long polling (development mode).")
-        application.run_polling()
+        if DEV_MODE:
+            logger.info("DEV_MODE=1 — using long polling.")
+        else:
+            logger.warning("No public URL found (WEBHOOK_URL, RENDER_EXTERNAL_URL, Railway, Fly) — falling back to long polling.")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES, drop_pending_updates=DROP_PENDING_UPDATES)
 
 
 if __name__ == "__main__":